@@ -1,7 +1,7 @@
 """AI Tools integration endpoints"""
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 
@@ -39,7 +39,7 @@ class RAGQuery(BaseModel):
 async def chat_with_llm(
     message: ChatMessage,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Chat with LLM"""
     # TODO: Implement actual LLM integration
@@ -63,7 +63,7 @@ async def chat_with_llm(
 async def rag_query(
     query: RAGQuery,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Query RAG system"""
     # TODO: Implement RAG query logic
@@ -77,7 +77,7 @@ async def rag_query(
 @router.post("/rag/upload")
 async def upload_document_for_rag(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload document for RAG"""
     # TODO: Implement document upload and vectorization
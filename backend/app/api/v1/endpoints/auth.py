@@ -2,7 +2,8 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import timedelta
@@ -10,10 +11,11 @@ from datetime import timedelta
 from app.core.database import get_db
 from app.core.security import verify_password, get_password_hash, create_access_token, decode_access_token
 from app.core.config import settings
+from app.core.cache import TTLCache
 from app.models.user import User
 
 router = APIRouter()
-# Authentication disabled - oauth2_scheme not required but kept for compatibility
+# auto_error=False so requests without a token can fall back to the default user
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 
@@ -43,43 +45,83 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
-def get_current_user(token: Optional[str] = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Get current authenticated user - Authentication disabled, returns dummy user"""
-    # Authentication disabled - return a dummy user
-    # Try to get or create a default user
-    user = db.query(User).filter(User.username == "user").first()
-    if not user:
-        # Create a dummy user if it doesn't exist
-        user = User(
-            username="user",
-            email="user@example.com",
-            full_name="User",
-            is_active=True,
-            hashed_password=get_password_hash("dummy")
+# Authenticated users by id (or DEFAULT_USER_KEY), detached from their session
+user_cache = TTLCache(ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+DEFAULT_USER_KEY = "default"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target: User):
+    """Drop a user from the cache whenever its row changes"""
+    user_cache.invalidate(target.id)
+    if target.username == settings.DEFAULT_USERNAME:
+        user_cache.invalidate(DEFAULT_USER_KEY)
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_user(token: Optional[str] = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    """Get the user of a request from its JWT, served from a short-lived cache"""
+    if token:
+        # An expired or forged token is rejected even when authentication is optional
+        payload = decode_access_token(token)
+        if not payload or not str(payload.get("sub", "")).isdigit():
+            raise credentials_exception()
+        key = int(payload["sub"])
+    elif settings.AUTH_REQUIRED:
+        raise credentials_exception()
+    else:
+        # Authentication disabled - requests without a token act as the default user
+        key = DEFAULT_USER_KEY
+    
+    user = user_cache.get(key)
+    if user is None:
+        if key == DEFAULT_USER_KEY:
+            user = await db.scalar(select(User).where(User.username == settings.DEFAULT_USERNAME))
+        else:
+            user = await db.get(User, key)
+        if not user:
+            raise credentials_exception()
+        # Detach so the cached instance outlives this request's session
+        db.expunge(user)
+        user_cache.set(key, user)
+        # End the lookup's transaction so the connection goes back to the pool; routes
+        # returning long-lived responses such as event streams keep the session until they end
+        await db.close()
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
         )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
     return user
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     try:
         # Ensure tables exist
-        from app.core.database import Base, engine
-        Base.metadata.create_all(bind=engine)
+        from app.core.database import Base, async_engine
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
         
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
-        existing_username = db.query(User).filter(User.username == user_data.username).first()
+        existing_username = await db.scalar(select(User).where(User.username == user_data.username))
         if existing_username:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,8 +138,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             is_active=True
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
         return user
     except HTTPException:
@@ -107,7 +149,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         error_trace = traceback.format_exc()
         print(f"Registration error: {e}")
         print(f"Traceback: {error_trace}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
@@ -115,9 +157,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """Login and get access token"""
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await db.scalar(select(User).where(User.username == form_data.username))
     
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
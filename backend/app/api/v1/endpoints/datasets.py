@@ -1,27 +1,62 @@
 """Dataset endpoints"""
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Any, List, Optional
 from pydantic import BaseModel
 from datetime import datetime
-import os
-import pandas as pd
 from pathlib import Path
 
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.cache import result_cache
+from app.core.executor import ExecutorSaturatedError, compute_executor
+from app.core.pagination import NEXT_OFFSET_HEADER, paginate
+from app.core.responses import ORJSONResponse, arrow_stream_response, wants_arrow
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
-from app.models.dataset import Dataset
+from app.models.dataset import Dataset, DatasetVersion
 from app.models.project import Project
+from app.services.upload_service import (
+    UploadTooLargeError,
+    UploadMissingFileError,
+    UploadSessionLimitError,
+    UploadSessionNotFoundError,
+    UploadOffsetMismatchError,
+    stream_request_to_file,
+    hash_file,
+    create_upload_session,
+    get_session_offset,
+    get_session_path,
+    append_upload_chunk,
+    discard_upload_session,
+    blob_lock,
+    blob_guard,
+    session_lock,
+    new_upload_path,
+    store_blob
+)
+from app.services.dataset_loader import format_for_path
+from app.services.dataset_storage import (
+    COLUMNAR_FORMATS,
+    convert_partition,
+    convert_to_columnar,
+    dataset_cache_tag,
+    dataset_parts,
+    ensure_columnar_copy,
+    new_partition_path,
+    read_columnar_schema,
+    remove_columnar_copy,
+    remove_partitions
+)
+from app.services.query_service import run_query
+from app.services.profiler import build_profile_metadata, extend_dataset_profile, file_fingerprint, profile_columnar
 
 router = APIRouter()
 
-# Ensure upload directory exists
-UPLOAD_DIR = Path(settings.UPLOAD_DIR)
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
 
 class DatasetResponse(BaseModel):
     """Dataset response schema"""
@@ -34,6 +69,7 @@ class DatasetResponse(BaseModel):
     column_count: int = None
     schema: dict = None
     tags: List[str]
+    version: int = 1
     project_id: int = None
     owner_id: int
     created_at: datetime
@@ -42,6 +78,53 @@ class DatasetResponse(BaseModel):
         from_attributes = True
 
 
+class DatasetVersionResponse(BaseModel):
+    """Dataset version response schema"""
+    id: int
+    dataset_id: int
+    version: int
+    content_hash: str
+    file_format: str
+    file_size: int
+    row_count: int
+    total_row_count: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class UploadSessionResponse(BaseModel):
+    """Resumable upload session schema"""
+    upload_id: str
+    offset: int
+
+
+class QueryFilter(BaseModel):
+    """Dataset query filter schema"""
+    column: str
+    op: str = "=="  # ==, !=, <, <=, >, >=, in, not_in, is_null, not_null
+    value: Any = None
+
+
+class QueryAggregate(BaseModel):
+    """Dataset query aggregate schema"""
+    column: str
+    func: str  # count, count_distinct, sum, mean, min, max, stddev, variance
+
+
+class DatasetQuery(BaseModel):
+    """Dataset query schema"""
+    columns: Optional[List[str]] = None  # Defaults to all columns
+    filters: List[QueryFilter] = []
+    group_by: List[str] = []
+    aggregates: List[QueryAggregate] = []
+    mode: str = "rows"  # rows, head, tail, sample; ignored when aggregating
+    limit: int = 100  # Capped at settings.QUERY_MAX_ROWS
+    offset: int = 0  # Start of the page in rows mode and for aggregates
+    seed: Optional[int] = None  # Random seed of sample mode
+
+
 class DatasetUpdate(BaseModel):
     """Dataset update schema"""
     name: str = None
@@ -51,43 +134,24 @@ class DatasetUpdate(BaseModel):
 
 def detect_file_format(filename: str) -> str:
     """Detect file format from extension"""
-    ext = Path(filename).suffix.lower()
-    format_map = {
-        '.csv': 'csv',
-        '.json': 'json',
-        '.xlsx': 'excel',
-        '.xls': 'excel',
-        '.parquet': 'parquet',
-        '.pkl': 'pickle',
-        '.h5': 'hdf5'
-    }
-    return format_map.get(ext, 'unknown')
-
-
-def analyze_dataset(file_path: str, file_format: str) -> dict:
-    """Analyze dataset and extract metadata"""
+    return format_for_path(filename)
+
+
+def analyze_dataset(file_path: str, file_format: str, content_hash: str) -> dict:
+    """Convert a dataset to its columnar copy and profile it in one streaming pass"""
+    if file_format not in COLUMNAR_FORMATS:
+        return {}
     try:
-        if file_format == 'csv':
-            df = pd.read_csv(file_path, nrows=1000)  # Sample for analysis
-        elif file_format == 'json':
-            df = pd.read_json(file_path)
-        elif file_format == 'excel':
-            df = pd.read_excel(file_path, nrows=1000)
-        elif file_format == 'parquet':
-            df = pd.read_parquet(file_path)
-        else:
-            return {}
-        
-        schema = {
-            "columns": list(df.columns),
-            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "shape": list(df.shape)
-        }
-        
+        # Convert once to a columnar copy that later reads memory-map
+        columnar_path = convert_to_columnar(file_path, file_format, content_hash)
+        profiler = profile_columnar(columnar_path)
         return {
-            "row_count": len(df),
-            "column_count": len(df.columns),
-            "schema": schema
+            "columnar_path": str(columnar_path),
+            "row_count": profiler.row_count,
+            "column_count": len(profiler.columns),
+            "schema": profiler.to_schema(),
+            "extra_metadata": build_profile_metadata(profiler, file_path),
+            "sketches": profiler.to_state()
         }
     except Exception as e:
         return {"error": str(e)}
@@ -95,97 +159,338 @@ def analyze_dataset(file_path: str, file_format: str) -> dict:
 
 @router.get("/", response_model=List[DatasetResponse])
 async def get_datasets(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    include_total: bool = False,
     project_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all datasets for current user"""
-    query = db.query(Dataset).filter(Dataset.owner_id == current_user.id)
+    """Get a page of datasets for current user, newest first"""
+    query = select(Dataset).where(Dataset.owner_id == current_user.id)
     
     if project_id:
-        query = query.filter(Dataset.project_id == project_id)
+        query = query.where(Dataset.project_id == project_id)
+    
+    return await paginate(db, query, Dataset, response, cursor, limit, include_total)
+
+
+async def get_owned_project(db: AsyncSession, project_id: Optional[int], current_user: User):
+    """Validate that an optional project belongs to the current user"""
+    if not project_id:
+        return None
+    project = await db.scalar(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == current_user.id
+    ))
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    return project
+
+
+def get_upload_format(filename: str) -> str:
+    """Detect an upload's file format, rejecting unsupported files"""
+    file_format = detect_file_format(filename)
+    if file_format == 'unknown':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format"
+        )
+    return file_format
+
+
+def multipart_file_body(field: str) -> dict:
+    """OpenAPI request body of an endpoint that streams a file field from the raw request"""
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {field: {"type": "string", "format": "binary"}},
+        "required": [field]
+    }}}}}
+
+
+async def receive_upload(request: Request, filename: Optional[str], too_large_detail: str) -> tuple:
+    """Stream a single-request upload to a temporary file.
+
+    Returns ``(file_path, file_size, content_hash, filename, file_format)``;
+    the multipart filename wins over the ``filename`` query parameter,
+    which names raw bodies.
+    """
+    file_path = new_upload_path()
+    try:
+        file_size, content_hash, received_name = await stream_request_to_file(
+            request, file_path, settings.MAX_UPLOAD_SIZE
+        )
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=too_large_detail
+        )
+    except UploadMissingFileError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    filename = received_name or filename
+    try:
+        if not filename:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Missing filename"
+            )
+        file_format = get_upload_format(filename)
+    except HTTPException:
+        file_path.unlink(missing_ok=True)
+        raise
+    return file_path, file_size, content_hash, filename, file_format
+
+
+def execute_query(dataset: Dataset, spec: dict, as_arrow: bool) -> tuple:
+    """Run a dataset query, building JSON rows unless it is streamed as Arrow; runs on the compute executor"""
+    table, next_offset = run_query(dataset_parts(dataset), spec)
+    return table if as_arrow else table.to_pylist(), table.column_names, next_offset
+
+
+async def analyze_upload(
+    db: AsyncSession,
+    file_path: Path,
+    file_format: str,
+    content_hash: str,
+    endpoint: str,
+    current_user: User
+) -> dict:
+    """Analyze an uploaded file, reusing the analysis of an earlier upload of the same content"""
+    # Only datasets without appended rows still describe just the uploaded file
+    analyzed = await db.scalar(select(Dataset).where(
+        Dataset.content_hash == content_hash,
+        Dataset.file_format == file_format,
+        Dataset.columnar_path.isnot(None),
+        Dataset.version == 1
+    ).limit(1))
+    if analyzed is not None and Path(analyzed.columnar_path).exists():
+        return {
+            "columnar_path": analyzed.columnar_path,
+            "row_count": analyzed.row_count,
+            "column_count": analyzed.column_count,
+            "schema": analyzed.schema,
+            "extra_metadata": analyzed.extra_metadata or {},
+            "sketches": await db.scalar(select(Dataset.sketches).where(Dataset.id == analyzed.id))
+        }
+    return await compute_executor.run(
+        endpoint, current_user.id,
+        analyze_dataset, str(file_path), file_format, content_hash
+    )
+
+
+async def create_dataset_record(
+    db: AsyncSession,
+    file_path: Path,
+    filename: str,
+    file_format: str,
+    file_size: int,
+    content_hash: str,
+    analysis: dict,
+    name: Optional[str],
+    description: Optional[str],
+    project_id: Optional[int],
+    current_user: User
+) -> Dataset:
+    """Store an analyzed upload as a blob and create its dataset record"""
+    if "error" in analysis:
+        print(f"Dataset analysis failed for {filename}: {analysis['error']}")
     
-    datasets = query.offset(skip).limit(limit).all()
-    return datasets
+    # Held until the commit, so a concurrent delete sees this dataset before dropping the blob
+    async with blob_guard(db, content_hash):
+        file_path = store_blob(file_path, content_hash, Path(filename).suffix)
+        
+        extra_metadata = analysis.get("extra_metadata", {})
+        if "fingerprint" in extra_metadata:
+            # The analysis saw the uploaded copy; record the blob it now describes
+            extra_metadata = {**extra_metadata, "fingerprint": file_fingerprint(file_path)}
+        
+        dataset = Dataset(
+            name=name or filename,
+            description=description,
+            file_path=str(file_path),
+            file_format=file_format,
+            file_size=file_size,
+            content_hash=content_hash,
+            columnar_path=analysis.get("columnar_path"),
+            row_count=analysis.get("row_count"),
+            column_count=analysis.get("column_count"),
+            schema=analysis.get("schema"),
+            extra_metadata=extra_metadata,
+            sketches=analysis.get("sketches"),
+            project_id=project_id,
+            owner_id=current_user.id
+        )
+        db.add(dataset)
+        await db.commit()
+        await db.refresh(dataset)
+    return dataset
 
 
-@router.post("/upload", response_model=DatasetResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/upload",
+    response_model=DatasetResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=multipart_file_body("file")
+)
 async def upload_dataset(
-    file: UploadFile = File(...),
+    request: Request,
+    filename: Optional[str] = None,
     name: Optional[str] = None,
     description: Optional[str] = None,
     project_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload a new dataset"""
-    # Validate project if provided
-    if project_id:
-        project = db.query(Project).filter(
-            Project.id == project_id,
-            Project.owner_id == current_user.id
-        ).first()
-        if not project:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Project not found"
-            )
+    await get_owned_project(db, project_id, current_user)
     
-    # Detect file format
-    file_format = detect_file_format(file.filename)
-    if file_format == 'unknown':
+    # Stream the body to disk, enforcing the size limit and hashing as chunks arrive
+    file_path, file_size, content_hash, filename, file_format = await receive_upload(
+        request, filename, "File too large, use a resumable upload via /datasets/uploads"
+    )
+    
+    try:
+        analysis = await analyze_upload(db, file_path, file_format, content_hash, "datasets.upload", current_user)
+    except ExecutorSaturatedError:
+        file_path.unlink(missing_ok=True)
+        raise
+    
+    return await create_dataset_record(
+        db, file_path, filename, file_format, file_size, content_hash, analysis,
+        name, description, project_id, current_user
+    )
+
+
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload(current_user: User = Depends(get_current_user)):
+    """Start a resumable upload for files above the regular upload limit"""
+    try:
+        upload_id = create_upload_session(current_user.id)
+    except UploadSessionLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"{e}; complete or cancel one first"
+        )
+    return UploadSessionResponse(upload_id=upload_id, offset=0)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Get the current offset of a resumable upload"""
+    try:
+        offset = get_session_offset(current_user.id, upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    return UploadSessionResponse(upload_id=upload_id, offset=offset)
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionResponse, openapi_extra=multipart_file_body("chunk"))
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Append a chunk to a resumable upload, starting at the given offset; the body is raw bytes or a multipart chunk field"""
+    try:
+        new_offset = await append_upload_chunk(current_user.id, upload_id, offset, request)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large"
+        )
+    except UploadMissingFileError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Unsupported file format"
+            detail=str(e)
         )
+    return UploadSessionResponse(upload_id=upload_id, offset=new_offset)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=DatasetResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload(
+    upload_id: str,
+    filename: str,
+    name: Optional[str] = None,
+    description: Optional[str] = None,
+    project_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Finish a resumable upload and create its dataset"""
+    await get_owned_project(db, project_id, current_user)
+    file_format = get_upload_format(filename)
     
-    # Save file
-    file_path = UPLOAD_DIR / f"{current_user.id}_{file.filename}"
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        if len(content) > settings.MAX_UPLOAD_SIZE:
+    # Chunks still being written would be missing from the hash and the dataset
+    async with session_lock(upload_id):
+        try:
+            file_size = get_session_offset(current_user.id, upload_id)
+        except UploadSessionNotFoundError:
             raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="File too large"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Upload not found"
             )
-        f.write(content)
-    
-    # Analyze dataset
-    analysis = analyze_dataset(str(file_path), file_format)
-    
-    # Create dataset record
-    dataset = Dataset(
-        name=name or file.filename,
-        description=description,
-        file_path=str(file_path),
-        file_format=file_format,
-        file_size=len(content),
-        row_count=analysis.get("row_count"),
-        column_count=analysis.get("column_count"),
-        schema=analysis.get("schema"),
-        project_id=project_id,
-        owner_id=current_user.id
-    )
-    db.add(dataset)
-    db.commit()
-    db.refresh(dataset)
-    
-    return dataset
+        
+        # Analyze before storing the file so a rejected call leaves the upload resumable
+        session_path = get_session_path(current_user.id, upload_id)
+        content_hash = await compute_executor.run(
+            "datasets.complete_upload", current_user.id, hash_file, session_path
+        )
+        analysis = await analyze_upload(
+            db, session_path, file_format, content_hash, "datasets.complete_upload", current_user
+        )
+        
+        return await create_dataset_record(
+            db, session_path, filename, file_format, file_size, content_hash, analysis,
+            name, description, project_id, current_user
+        )
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Abort a resumable upload and discard the received bytes"""
+    try:
+        async with session_lock(upload_id):
+            discard_upload_session(current_user.id, upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    return None
 
 
 @router.get("/{dataset_id}", response_model=DatasetResponse)
 async def get_dataset(
     dataset_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific dataset"""
-    dataset = db.query(Dataset).filter(
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == dataset_id,
         Dataset.owner_id == current_user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(
@@ -196,17 +501,202 @@ async def get_dataset(
     return dataset
 
 
+@router.post("/{dataset_id}/query")
+async def query_dataset(
+    dataset_id: int,
+    query: DatasetQuery,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Filter, project, sample or aggregate a dataset without loading it, as JSON or an Arrow IPC stream"""
+    dataset = await db.scalar(select(Dataset).where(
+        Dataset.id == dataset_id,
+        Dataset.owner_id == current_user.id
+    ))
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset.file_format not in COLUMNAR_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format for queries"
+        )
+    
+    if query.limit < 1 or query.offset < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be positive and offset non-negative"
+        )
+    
+    as_arrow = wants_arrow(request)
+    try:
+        result, columns, next_offset = await compute_executor.run(
+            "datasets.query", current_user.id, execute_query, dataset, query.model_dump(), as_arrow
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    # Record the columnar copy if the query had to create it
+    if db.is_modified(dataset):
+        await db.commit()
+    
+    if as_arrow:
+        headers = {NEXT_OFFSET_HEADER: str(next_offset)} if next_offset is not None else {}
+        return arrow_stream_response(result, headers)
+    return ORJSONResponse({
+        "columns": columns,
+        "rows": result,
+        "row_count": len(result),
+        "next_offset": next_offset
+    })
+
+
+def append_rows(dataset: Dataset, sketches: Optional[dict], file_path: str, file_format: str, version: int) -> int:
+    """Write appended rows as a new partition and fold them into the stored profile; runs on the compute executor"""
+    schema = read_columnar_schema(ensure_columnar_copy(dataset))
+    partition_path = convert_partition(file_path, file_format, schema, new_partition_path(dataset.id, version))
+    try:
+        rows_added = extend_dataset_profile(dataset, partition_path, sketches)
+    except Exception:
+        partition_path.unlink(missing_ok=True)
+        raise
+    dataset.partitions = [*(dataset.partitions or []), str(partition_path)]
+    dataset.version = version
+    return rows_added
+
+
+@router.post(
+    "/{dataset_id}/append",
+    response_model=DatasetVersionResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=multipart_file_body("file")
+)
+async def append_dataset(
+    dataset_id: int,
+    request: Request,
+    filename: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Append rows to a dataset as a new version, processing only the new rows"""
+    dataset = await db.scalar(select(Dataset).where(
+        Dataset.id == dataset_id,
+        Dataset.owner_id == current_user.id
+    ))
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset.file_format not in COLUMNAR_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format for appending"
+        )
+    
+    file_path, file_size, content_hash, filename, file_format = await receive_upload(
+        request, filename, "File too large"
+    )
+    if file_format not in COLUMNAR_FORMATS:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format for appending"
+        )
+    
+    try:
+        # Appends to one dataset run one at a time so versions stay consecutive
+        async with blob_lock(f"dataset:{dataset.id}"):
+            await db.refresh(dataset)
+            previous_tag = dataset_cache_tag(dataset)
+            version = (dataset.version or 1) + 1
+            # Deferred, so list and detail queries do not load it
+            sketches = await db.scalar(select(Dataset.sketches).where(Dataset.id == dataset.id))
+            try:
+                rows_added = await compute_executor.run(
+                    "datasets.append", current_user.id,
+                    append_rows, dataset, sketches, str(file_path), file_format, version
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            dataset_version = DatasetVersion(
+                dataset_id=dataset.id,
+                version=version,
+                content_hash=content_hash,
+                file_format=file_format,
+                file_size=file_size,
+                partition_path=dataset.partitions[-1],
+                row_count=rows_added,
+                total_row_count=dataset.row_count
+            )
+            db.add(dataset_version)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker appended the same version first
+                await db.rollback()
+                Path(dataset_version.partition_path).unlink(missing_ok=True)
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Dataset was modified concurrently, please retry"
+                )
+            await db.refresh(dataset_version)
+    finally:
+        file_path.unlink(missing_ok=True)
+    
+    # Results of the superseded version can no longer be requested
+    if previous_tag != dataset.content_hash:
+        await result_cache.invalidate(previous_tag)
+    return dataset_version
+
+
+@router.get("/{dataset_id}/versions", response_model=List[DatasetVersionResponse])
+async def get_dataset_versions(
+    dataset_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the appended versions of a dataset, oldest first"""
+    dataset = await db.scalar(select(Dataset).where(
+        Dataset.id == dataset_id,
+        Dataset.owner_id == current_user.id
+    ))
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    versions = await db.scalars(
+        select(DatasetVersion).where(DatasetVersion.dataset_id == dataset_id).order_by(DatasetVersion.version)
+    )
+    return versions.all()
+
+
 @router.delete("/{dataset_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_dataset(
     dataset_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a dataset"""
-    dataset = db.query(Dataset).filter(
+    dataset = await db.scalar(select(Dataset).options(selectinload(Dataset.versions)).where(
         Dataset.id == dataset_id,
         Dataset.owner_id == current_user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(
@@ -214,11 +704,28 @@ async def delete_dataset(
             detail="Dataset not found"
         )
     
-    # Delete file
-    if os.path.exists(dataset.file_path):
-        os.remove(dataset.file_path)
-    
-    db.delete(dataset)
-    db.commit()
+    file_path = dataset.file_path
+    content_hash = dataset.content_hash
+    cache_tag = dataset_cache_tag(dataset)
+    async with blob_guard(db, content_hash or file_path):
+        await db.delete(dataset)
+        await db.flush()
+        
+        # Blobs and columnar copies are shared by identical uploads; drop them with their last reference.
+        # The checks run in the deleting transaction, under the lock uploads of the same blob take
+        file_in_use = await db.scalar(select(Dataset.id).where(Dataset.file_path == file_path).limit(1))
+        hash_in_use = content_hash is None or await db.scalar(
+            select(Dataset.id).where(Dataset.content_hash == content_hash).limit(1)
+        )
+        if not file_in_use:
+            Path(file_path).unlink(missing_ok=True)
+        if not hash_in_use:
+            remove_columnar_copy(content_hash)
+        await db.commit()
+    if not hash_in_use:
+        await result_cache.invalidate(content_hash)
+    remove_partitions(dataset_id)
+    if cache_tag != content_hash:
+        await result_cache.invalidate(cache_tag)
     return None
 
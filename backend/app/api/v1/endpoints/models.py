@@ -1,18 +1,57 @@
 """ML Model endpoints"""
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional, Dict, Any
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
+import asyncio
 import json
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.config import settings
+from app.core.executor import compute_executor
+from app.core.pagination import paginate
+from app.core.responses import (
+    ARROW_STREAM_MEDIA_TYPE,
+    EVENT_STREAM_MEDIA_TYPE,
+    ORJSONResponse,
+    arrow_stream_response,
+    sse_event,
+    wants_arrow
+)
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
 from app.models.model import MLModel, ModelVersion, ModelExperiment
 from app.models.project import Project
 from app.models.dataset import Dataset
+from app.services.dataset_storage import COLUMNAR_FORMATS, dataset_dtypes, dataset_parts
+from app.services.training_service import training_executor, next_model_version
+from app.services.training_progress import TERMINAL_EVENTS, progress_hub
+from app.services.model_cache import model_cache
+from app.services.ml_service import SAVE_PROFILES
+from app.services.streaming_training import STREAMING_ALGORITHMS
+from app.services.algorithms import ALGORITHMS, MODEL_TYPES, get_algorithm
+from app.services.feature_pipeline import ENCODINGS
+from app.services.search_service import (
+    HyperparameterSearch,
+    generate_candidates,
+    get_search,
+    start_search
+)
+
+# Metrics shown by the model registry unless others are requested
+REGISTRY_DEFAULT_METRICS = ("accuracy", "f1_score", "r2_score", "rmse")
+REGISTRY_MAX_METRICS = 20
 
 router = APIRouter()
 
@@ -36,10 +75,31 @@ class ModelUpdate(BaseModel):
 class TrainingConfig(BaseModel):
     """Training configuration schema"""
     dataset_id: int
+    dataset_version: Optional[int] = None  # Pins the rows trained on; defaults to the latest version
     target_column: str
     test_size: float = 0.2
     random_state: int = 42
     hyperparameters: Dict[str, Any] = {}
+    n_jobs: Optional[int] = None  # CPU allotment, defaults to settings.TRAINING_JOB_CPUS
+    save_profile: Optional[str] = None  # fast, compressed; defaults to settings.MODEL_SAVE_PROFILE
+    encodings: Dict[str, str] = {}  # Per-column override: onehot, hashing, ordinal, target
+    streaming: Optional[bool] = None  # Train out of core with partial_fit; defaults to on for streaming algorithms
+
+
+class PredictionRequest(BaseModel):
+    """Batch prediction request schema"""
+    rows: List[Dict[str, Any]]
+    version_id: Optional[int] = None  # Defaults to the latest version
+
+
+class SearchConfig(TrainingConfig):
+    """Hyperparameter search schema; hyperparameters holds values shared by all trials"""
+    strategy: str = "random"  # grid, random, halving
+    param_grid: Dict[str, List[Any]]
+    n_trials: int = 10  # Candidates sampled by random and halving searches
+    scoring: Optional[str] = None  # Defaults to accuracy or r2_score
+    max_parallel: Optional[int] = None  # Capped at settings.SEARCH_MAX_PARALLEL
+    halving_factor: int = 3
 
 
 class ModelResponse(BaseModel):
@@ -71,37 +131,258 @@ class ModelVersionResponse(BaseModel):
         from_attributes = True
 
 
+class ExperimentResponse(BaseModel):
+    """Model experiment response schema"""
+    id: int
+    name: str
+    description: str = None
+    status: str
+    metrics: Dict[str, Any] = None
+    hyperparameters: Dict[str, Any] = None
+    resource_usage: Dict[str, Any] = None
+    created_at: datetime
+    completed_at: datetime = None
+    
+    class Config:
+        from_attributes = True
+
+
+class VersionSummary(BaseModel):
+    """Model version summary schema with a subset of its metrics"""
+    id: int
+    version: str
+    created_at: datetime
+    metrics: Dict[str, Any]
+
+
+class ModelRegistryEntry(ModelResponse):
+    """Model with its latest version schema"""
+    latest_version: Optional[VersionSummary] = None
+
+
+def parse_metric_keys(metrics: Optional[str]) -> List[str]:
+    """Parse a comma-separated list of metric names"""
+    if not metrics:
+        return list(REGISTRY_DEFAULT_METRICS)
+    keys = list(dict.fromkeys(key.strip() for key in metrics.split(",") if key.strip()))
+    if len(keys) > REGISTRY_MAX_METRICS or not all(key.replace("_", "").isalnum() for key in keys):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"metrics must be up to {REGISTRY_MAX_METRICS} comma-separated metric names"
+        )
+    return keys
+
+
+def use_streaming(model: MLModel, config: TrainingConfig) -> bool:
+    """Whether a training request streams its dataset through partial_fit instead of loading it"""
+    if config.streaming is not None:
+        return config.streaming
+    return model.algorithm in STREAMING_ALGORITHMS.get(model.model_type, ())
+
+
+async def prepare_training(model_id: int, config: TrainingConfig, current_user: User, db: AsyncSession):
+    """Validate a training request and get its model, dataset and the columnar parts of the pinned version"""
+    model = await db.scalar(select(MLModel).where(
+        MLModel.id == model_id,
+        MLModel.owner_id == current_user.id
+    ))
+    
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Model not found"
+        )
+    
+    # Validate dataset
+    dataset = await db.scalar(select(Dataset).where(
+        Dataset.id == config.dataset_id,
+        Dataset.owner_id == current_user.id
+    ))
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset.file_format not in COLUMNAR_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported dataset format for training"
+        )
+    
+    unsupported = set(config.encodings.values()) - set(ENCODINGS)
+    if unsupported:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported encodings: {sorted(unsupported)}"
+        )
+    
+    if config.save_profile and config.save_profile not in SAVE_PROFILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported save profile: {config.save_profile}"
+        )
+    
+    if use_streaming(model, config):
+        if model.algorithm not in STREAMING_ALGORITHMS.get(model.model_type, ()):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Algorithm {model.algorithm} cannot be trained in streaming mode"
+            )
+    else:
+        try:
+            get_algorithm(model.algorithm, model.model_type)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    if config.dataset_version is not None and not 1 <= config.dataset_version <= (dataset.version or 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Dataset has no version {config.dataset_version}"
+        )
+    
+    # Workers memory-map the columnar parts instead of re-parsing the raw file
+    parts = await compute_executor.run(
+        "models.prepare_training", current_user.id, dataset_parts, dataset, config.dataset_version
+    )
+    dataset_path = [str(part) for part in parts]
+    
+    return model, dataset, dataset_path
+
+
+async def get_owned_search(model_id: int, search_id: str, current_user: User, db: AsyncSession) -> HyperparameterSearch:
+    """Get a search of a model owned by the current user"""
+    model = await db.scalar(select(MLModel).where(
+        MLModel.id == model_id,
+        MLModel.owner_id == current_user.id
+    ))
+    search = get_search(search_id)
+    if not model or not search or search.model_id != model_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Search not found"
+        )
+    return search
+
+
+def run_prediction(version_id: int, model_path: str, rows: pd.DataFrame) -> np.ndarray:
+    """Predict rows with a cached model version; runs on the compute executor"""
+    estimator = model_cache.get(version_id, model_path)
+    service = model_cache.service
+    return service.predict(estimator, service.prepare_features(estimator, rows))
+
+
+def compress_model_artifact(model_path: str):
+    """Re-save a model artifact with the compressed save profile; runs on the compute executor"""
+    # Load fully into memory first; the dump below overwrites the mapped file
+    estimator = joblib.load(model_path)
+    tmp_path = f"{model_path}.tmp"
+    model_cache.service.dump_model(estimator, tmp_path, "compressed")
+    os.replace(tmp_path, model_path)
+
+
+async def experiment_events(experiment_id: int, snapshot: dict, since: float) -> AsyncIterator[bytes]:
+    """Yield an experiment's stored state, then its progress events until it finishes.
+
+    Events come from jobs running on this server. When none arrive for a
+    while the stored experiment is sent again, which keeps the connection
+    alive and follows jobs running on other servers.
+    """
+    yield sse_event("snapshot", snapshot)
+    if snapshot["status"] in TERMINAL_EVENTS:
+        return
+    queue, history = progress_hub.subscribe(experiment_id)
+    try:
+        # Events published before the snapshot was read are already part of it
+        for event in history:
+            if event["time"] >= since:
+                yield sse_event(event["event"], event)
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.TRAINING_EVENTS_REFRESH_SECONDS)
+            except asyncio.TimeoutError:
+                async with AsyncSessionLocal() as db:
+                    experiment = await db.get(ModelExperiment, experiment_id)
+                if experiment is None:
+                    return
+                yield sse_event("snapshot", ExperimentResponse.model_validate(experiment).model_dump())
+                if experiment.status in TERMINAL_EVENTS:
+                    return
+                continue
+            yield sse_event(event["event"], event)
+            if event["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        progress_hub.unsubscribe(experiment_id, queue)
+
+
+def feature_dtypes(dataset: Dataset, target_column: str) -> Optional[dict]:
+    """Compact dtypes of a dataset's columns, leaving the target as stored so labels and metrics are unchanged"""
+    dtypes = dataset_dtypes(dataset)
+    if dtypes is None:
+        return None
+    return {col: dtype for col, dtype in dtypes.items() if col != target_column}
+
+
+def build_training_params(model: MLModel, dataset: Dataset, dataset_path: List[str], config: TrainingConfig) -> dict:
+    """Build the parameters passed to training workers"""
+    return {
+        "model_id": model.id,
+        "model_type": model.model_type,
+        "algorithm": model.algorithm,
+        "dataset_id": dataset.id,
+        "dataset_version": config.dataset_version or dataset.version or 1,
+        "dataset_path": dataset_path,
+        "target_column": config.target_column,
+        "test_size": config.test_size,
+        "random_state": config.random_state,
+        "hyperparameters": config.hyperparameters,
+        "n_jobs": min(config.n_jobs or settings.TRAINING_JOB_CPUS, os.cpu_count() or 1),
+        "save_profile": config.save_profile or settings.MODEL_SAVE_PROFILE,
+        "encodings": config.encodings,
+        "dtypes": feature_dtypes(dataset, config.target_column),
+        "streaming": use_streaming(model, config)
+    }
+
+
 @router.get("/", response_model=List[ModelResponse])
 async def get_models(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    include_total: bool = False,
     project_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all models for current user"""
-    query = db.query(MLModel).filter(MLModel.owner_id == current_user.id)
+    """Get a page of models for current user, newest first"""
+    query = select(MLModel).where(MLModel.owner_id == current_user.id)
     
     if project_id:
-        query = query.filter(MLModel.project_id == project_id)
+        query = query.where(MLModel.project_id == project_id)
     
-    models = query.offset(skip).limit(limit).all()
-    return models
+    return await paginate(db, query, MLModel, response, cursor, limit, include_total)
 
 
 @router.post("/", response_model=ModelResponse, status_code=status.HTTP_201_CREATED)
 async def create_model(
     model_data: ModelCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new ML model"""
     # Validate project if provided
     if model_data.project_id:
-        project = db.query(Project).filter(
+        project = await db.scalar(select(Project).where(
             Project.id == model_data.project_id,
             Project.owner_id == current_user.id
-        ).first()
+        ))
         if not project:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -117,22 +398,89 @@ async def create_model(
         owner_id=current_user.id
     )
     db.add(model)
-    db.commit()
-    db.refresh(model)
+    await db.commit()
+    await db.refresh(model)
     return model
 
 
+@router.get("/registry", response_model=List[ModelRegistryEntry])
+async def get_model_registry(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    include_total: bool = False,
+    project_id: Optional[int] = None,
+    metrics: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a page of models with their latest version and selected metrics in one query"""
+    keys = parse_metric_keys(metrics)
+    
+    latest_version_id = (
+        select(func.max(ModelVersion.id))
+        .where(ModelVersion.model_id == MLModel.id)
+        .correlate(MLModel)
+        .scalar_subquery()
+    )
+    # Extract only the requested keys from the metrics JSON in the database
+    metric_columns = [ModelVersion.metrics[key].label(f"metric_{i}") for i, key in enumerate(keys)]
+    query = (
+        select(MLModel, ModelVersion.id, ModelVersion.version, ModelVersion.created_at, *metric_columns)
+        .outerjoin(ModelVersion, ModelVersion.id == latest_version_id)
+        .where(MLModel.owner_id == current_user.id)
+    )
+    if project_id:
+        query = query.where(MLModel.project_id == project_id)
+    
+    rows = await paginate(db, query, MLModel, response, cursor, limit, include_total, scalars=False)
+    
+    entries = []
+    for model, version_id, version, created_at, *values in rows:
+        latest_version = None
+        if version_id is not None:
+            latest_version = VersionSummary(
+                id=version_id,
+                version=version,
+                created_at=created_at,
+                metrics={key: value for key, value in zip(keys, values) if value is not None}
+            )
+        entries.append(ModelRegistryEntry(
+            **ModelResponse.model_validate(model).model_dump(),
+            latest_version=latest_version
+        ))
+    return entries
+
+
+@router.get("/algorithms")
+async def get_algorithms():
+    """List the trainable algorithms per model type"""
+    return {
+        "algorithms": {
+            name: {"model_types": list(MODEL_TYPES), "early_stopping": algorithm.early_stopping}
+            for name, algorithm in ALGORITHMS.items()
+        },
+        "streaming": STREAMING_ALGORITHMS
+    }
+
+
+@router.get("/cache/stats")
+async def get_model_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get model cache usage, cold-load times and resident memory of this worker"""
+    return model_cache.stats()
+
+
 @router.get("/{model_id}", response_model=ModelResponse)
 async def get_model(
     model_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific model"""
-    model = db.query(MLModel).filter(
+    model = await db.scalar(select(MLModel).where(
         MLModel.id == model_id,
         MLModel.owner_id == current_user.id
-    ).first()
+    ))
     
     if not model:
         raise HTTPException(
@@ -147,47 +495,28 @@ async def get_model(
 async def train_model(
     model_id: int,
     config: TrainingConfig,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Train a model"""
-    model = db.query(MLModel).filter(
-        MLModel.id == model_id,
-        MLModel.owner_id == current_user.id
-    ).first()
-    
-    if not model:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Model not found"
-        )
-    
-    # Validate dataset
-    dataset = db.query(Dataset).filter(
-        Dataset.id == config.dataset_id,
-        Dataset.owner_id == current_user.id
-    ).first()
-    
-    if not dataset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Dataset not found"
-        )
+    model, dataset, dataset_path = await prepare_training(model_id, config, current_user, db)
     
     # Create experiment
     experiment = ModelExperiment(
         name=f"Training {model.name}",
         model_id=model_id,
         hyperparameters=config.hyperparameters,
-        status="running"
+        status="queued"
     )
     db.add(experiment)
     model.status = "training"
-    db.commit()
+    await db.commit()
+    await db.refresh(experiment)
     
-    # TODO: Implement actual training logic in background task
-    # background_tasks.add_task(train_model_task, model_id, config, experiment.id)
+    training_executor.submit(experiment.id, {
+        **build_training_params(model, dataset, dataset_path, config),
+        "version": await db.run_sync(next_model_version, experiment)
+    })
     
     return {
         "message": "Training started",
@@ -196,17 +525,257 @@ async def train_model(
     }
 
 
+@router.post("/{model_id}/search", status_code=status.HTTP_202_ACCEPTED)
+async def search_hyperparameters(
+    model_id: int,
+    config: SearchConfig,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Run a parallel hyperparameter search and promote the best trial to a model version"""
+    model, dataset, dataset_path = await prepare_training(model_id, config, current_user, db)
+    if use_streaming(model, config):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Hyperparameter searches do not support streaming training"
+        )
+    
+    try:
+        candidates = generate_candidates(config.strategy, config.param_grid, config.n_trials, config.random_state)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if not candidates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parameter grid has no candidates"
+        )
+    
+    scoring = config.scoring or ("r2_score" if model.model_type == "regression" else "accuracy")
+    
+    # One experiment per trial
+    experiments = [
+        ModelExperiment(
+            name=f"Search trial {i + 1} for {model.name}",
+            model_id=model_id,
+            hyperparameters={**config.hyperparameters, **candidate},
+            status="queued"
+        )
+        for i, candidate in enumerate(candidates)
+    ]
+    db.add_all(experiments)
+    model.status = "training"
+    await db.commit()
+    
+    search = start_search(HyperparameterSearch(
+        model_id=model_id,
+        params=build_training_params(model, dataset, dataset_path, config),
+        candidates=candidates,
+        experiment_ids=[experiment.id for experiment in experiments],
+        strategy=config.strategy,
+        scoring=scoring,
+        max_parallel=min(config.max_parallel or settings.SEARCH_MAX_PARALLEL, settings.SEARCH_MAX_PARALLEL),
+        halving_factor=config.halving_factor
+    ))
+    
+    return search.state()
+
+
+@router.get("/{model_id}/search/{search_id}")
+async def get_search_status(
+    model_id: int,
+    search_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the progress of a hyperparameter search"""
+    search = await get_owned_search(model_id, search_id, current_user, db)
+    return search.state()
+
+
+@router.post("/{model_id}/search/{search_id}/cancel")
+async def cancel_search(
+    model_id: int,
+    search_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Cancel the remaining trials of a hyperparameter search"""
+    search = await get_owned_search(model_id, search_id, current_user, db)
+    search.cancel()
+    return search.state()
+
+
+@router.get("/{model_id}/experiments/{experiment_id}", response_model=ExperimentResponse)
+async def get_experiment(
+    model_id: int,
+    experiment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get an experiment with its metrics and resource usage"""
+    experiment = await db.scalar(select(ModelExperiment).join(MLModel).where(
+        ModelExperiment.id == experiment_id,
+        ModelExperiment.model_id == model_id,
+        MLModel.owner_id == current_user.id
+    ))
+    
+    if not experiment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Experiment not found"
+        )
+    
+    return experiment
+
+
+@router.get("/{model_id}/experiments/{experiment_id}/events")
+async def stream_experiment_events(
+    model_id: int,
+    experiment_id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream an experiment's stage timings and progress as server-sent events"""
+    since = time.time()
+    # A short-lived session: one from get_db would stay checked out until the stream ends
+    async with AsyncSessionLocal() as db:
+        experiment = await db.scalar(select(ModelExperiment).join(MLModel).where(
+            ModelExperiment.id == experiment_id,
+            ModelExperiment.model_id == model_id,
+            MLModel.owner_id == current_user.id
+        ))
+        
+        if not experiment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Experiment not found"
+            )
+        
+        snapshot = ExperimentResponse.model_validate(experiment).model_dump()
+    return StreamingResponse(
+        experiment_events(experiment_id, snapshot, since),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        # Proxies must pass events through as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/{model_id}/experiments/{experiment_id}/cancel")
+async def cancel_training(
+    model_id: int,
+    experiment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Cancel a queued or running training job"""
+    experiment = await db.scalar(select(ModelExperiment).join(MLModel).where(
+        ModelExperiment.id == experiment_id,
+        ModelExperiment.model_id == model_id,
+        MLModel.owner_id == current_user.id
+    ))
+    
+    if not experiment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Experiment not found"
+        )
+    
+    if experiment.status not in ("queued", "running") or not training_executor.cancel(experiment_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Experiment is not running on this server"
+        )
+    
+    return {
+        "message": "Training cancelled",
+        "experiment_id": experiment_id,
+        "model_id": model_id
+    }
+
+
+@router.post("/{model_id}/predict")
+async def predict(
+    model_id: int,
+    request: Request,
+    version_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Predict a batch of rows sent as JSON or as an Arrow IPC stream, answering in the format the client accepts"""
+    model = await db.scalar(select(MLModel).where(
+        MLModel.id == model_id,
+        MLModel.owner_id == current_user.id
+    ))
+    
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Model not found"
+        )
+    
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith(ARROW_STREAM_MEDIA_TYPE):
+            rows = pa.ipc.open_stream(body).read_all().to_pandas()
+        else:
+            payload = PredictionRequest.model_validate_json(body)
+            rows = pd.DataFrame(payload.rows)
+            version_id = payload.version_id or version_id
+    except (ValidationError, pa.ArrowInvalid) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid prediction payload: {str(e)}"
+        )
+    
+    query = select(ModelVersion).where(ModelVersion.model_id == model_id)
+    if version_id:
+        query = query.where(ModelVersion.id == version_id)
+    version = await db.scalar(query.order_by(ModelVersion.id.desc()).limit(1))
+    
+    if not version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Model version not found"
+        )
+    
+    try:
+        predictions = await compute_executor.run(
+            "models.predict", current_user.id, run_prediction, version.id, version.model_path, rows
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Prediction failed: {str(e)}"
+        )
+    
+    if wants_arrow(request):
+        return arrow_stream_response(
+            pa.table({"prediction": predictions}),
+            headers={"X-Model-Id": str(model_id), "X-Model-Version-Id": str(version.id)}
+        )
+    # orjson writes the numpy array directly, without a tolist() round trip
+    return ORJSONResponse({
+        "model_id": model_id,
+        "version_id": version.id,
+        "predictions": predictions
+    })
+
+
 @router.get("/{model_id}/versions", response_model=List[ModelVersionResponse])
 async def get_model_versions(
     model_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all versions of a model"""
-    model = db.query(MLModel).filter(
+    model = await db.scalar(select(MLModel).where(
         MLModel.id == model_id,
         MLModel.owner_id == current_user.id
-    ).first()
+    ))
     
     if not model:
         raise HTTPException(
@@ -214,20 +783,59 @@ async def get_model_versions(
             detail="Model not found"
         )
     
-    return model.versions
+    versions = await db.scalars(
+        select(ModelVersion).where(ModelVersion.model_id == model_id).order_by(ModelVersion.id)
+    )
+    return versions.all()
+
+
+@router.post("/{model_id}/versions/{version_id}/archive", response_model=ModelVersionResponse)
+async def archive_model_version(
+    model_id: int,
+    version_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Re-save a cold model version with the compressed save profile"""
+    version = await db.scalar(select(ModelVersion).join(MLModel).where(
+        ModelVersion.id == version_id,
+        ModelVersion.model_id == model_id,
+        MLModel.owner_id == current_user.id
+    ))
+    
+    if not version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Model version not found"
+        )
+    
+    if model_cache.service.is_memory_mappable(version.model_path):
+        model_cache.invalidate(version.id)
+        await compute_executor.run(
+            "models.archive_version", current_user.id, compress_model_artifact, version.model_path
+        )
+        version.training_config = {**(version.training_config or {}), "save_profile": "compressed"}
+        await db.commit()
+        await db.refresh(version)
+    
+    return version
 
 
 @router.delete("/{model_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_model(
     model_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a model"""
-    model = db.query(MLModel).filter(
+    # Load the cascaded collections up front instead of one lazy load each
+    model = await db.scalar(select(MLModel).options(
+        selectinload(MLModel.versions),
+        selectinload(MLModel.experiments)
+    ).where(
         MLModel.id == model_id,
         MLModel.owner_id == current_user.id
-    ).first()
+    ))
     
     if not model:
         raise HTTPException(
@@ -235,7 +843,10 @@ async def delete_model(
             detail="Model not found"
         )
     
-    db.delete(model)
-    db.commit()
+    for version in model.versions:
+        model_cache.invalidate(version.id)
+    
+    await db.delete(model)
+    await db.commit()
     return None
 
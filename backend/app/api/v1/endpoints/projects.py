@@ -1,15 +1,21 @@
 """Project endpoints"""
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.config import settings
+from app.core.pagination import paginate
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
 from app.models.project import Project
+from app.models.dataset import Dataset
+from app.models.model import MLModel
 
 router = APIRouter()
 
@@ -48,23 +54,23 @@ class ProjectResponse(BaseModel):
 
 @router.get("/", response_model=List[ProjectResponse])
 async def get_projects(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all projects for current user"""
-    projects = db.query(Project).filter(
-        Project.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return projects
+    """Get a page of projects for current user, newest first"""
+    query = select(Project).where(Project.owner_id == current_user.id)
+    return await paginate(db, query, Project, response, cursor, limit, include_total)
 
 
 @router.post("/", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 async def create_project(
     project_data: ProjectCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new project"""
     project = Project(
@@ -75,8 +81,8 @@ async def create_project(
         owner_id=current_user.id
     )
     db.add(project)
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
 
@@ -84,13 +90,13 @@ async def create_project(
 async def get_project(
     project_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific project"""
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -106,13 +112,13 @@ async def update_project(
     project_id: int,
     project_data: ProjectUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a project"""
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -129,8 +135,8 @@ async def update_project(
     if project_data.status is not None:
         project.status = project_data.status
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
 
@@ -138,13 +144,18 @@ async def update_project(
 async def delete_project(
     project_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a project"""
-    project = db.query(Project).filter(
+    # Load everything the delete cascades to; async sessions cannot lazy load
+    project = await db.scalar(select(Project).options(
+        selectinload(Project.datasets).selectinload(Dataset.versions),
+        selectinload(Project.models).selectinload(MLModel.versions),
+        selectinload(Project.models).selectinload(MLModel.experiments)
+    ).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -152,7 +163,7 @@ async def delete_project(
             detail="Project not found"
         )
     
-    db.delete(project)
-    db.commit()
+    await db.delete(project)
+    await db.commit()
     return None
 
@@ -1,18 +1,37 @@
 """Data visualization endpoints"""
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-import json
+import orjson
+import pyarrow as pa
 
+from app.core.cache import cache_key, result_cache
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.executor import compute_executor
+from app.core.responses import (
+    arrow_stream_response,
+    cache_headers,
+    dumps,
+    etag_matches,
+    not_modified,
+    wants_arrow
+)
 from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User
 from app.models.dataset import Dataset
+from app.services.dataset_storage import (
+    COLUMNAR_FORMATS,
+    dataset_cache_tag,
+    ensure_columnar_copy,
+    load_dataset_frame,
+    read_columnar_schema
+)
+from app.services.profiler import load_dataset_summary, summary_to_table
+from app.services.chart_service import build_chart
 
 router = APIRouter()
 
@@ -25,19 +44,64 @@ class VisualizationRequest(BaseModel):
     y_column: Optional[str] = None
     color_column: Optional[str] = None
     aggregation: Optional[str] = None  # sum, mean, count, etc.
+    max_points: Optional[int] = None  # Capped at settings.CHART_POINT_BUDGET
+
+
+def chart_cache_key(request: VisualizationRequest) -> str:
+    """Cache key of a chart request, ignoring fields its chart type does not use"""
+    params = {
+        "chart_type": request.chart_type,
+        "max_points": min(request.max_points or settings.CHART_POINT_BUDGET, settings.CHART_POINT_BUDGET)
+    }
+    if request.chart_type != "heatmap":
+        params.update(
+            x_column=request.x_column,
+            y_column=request.y_column,
+            color_column=request.color_column,
+            aggregation=request.aggregation
+        )
+    return cache_key({"kind": "chart", **params})
+
+
+def render_chart(dataset: Dataset, request: VisualizationRequest) -> str:
+    """Load the columns a chart needs and build its figure JSON; runs on the compute executor"""
+    if request.chart_type == "heatmap":
+        schema = read_columnar_schema(ensure_columnar_copy(dataset))
+        columns = [
+            field.name for field in schema
+            if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+        ]
+    else:
+        columns = list(dict.fromkeys(
+            col for col in (request.x_column, request.y_column, request.color_column) if col
+        ))
+    df = load_dataset_frame(dataset, columns)
+    
+    # Aggregate and downsample before plotting so the figure stays within the point budget
+    fig = build_chart(
+        df,
+        request.chart_type,
+        x=request.x_column,
+        y=request.y_column,
+        color=request.color_column,
+        aggregation=request.aggregation,
+        point_budget=request.max_points
+    )
+    return fig.to_json(engine="orjson")
 
 
 @router.get("/{dataset_id}/summary")
 async def get_dataset_summary(
     dataset_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get statistical summary of a dataset"""
-    dataset = db.query(Dataset).filter(
+    """Get statistical summary of a dataset, as JSON or as an Arrow IPC stream with one row per column"""
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == dataset_id,
         Dataset.owner_id == current_user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(
@@ -45,33 +109,34 @@ async def get_dataset_summary(
             detail="Dataset not found"
         )
     
+    if dataset.file_format not in COLUMNAR_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format for visualization"
+        )
+    
+    as_arrow = wants_arrow(request)
+    key = cache_key({"kind": "summary"})
+    etag = result_cache.etag(dataset_cache_tag(dataset), f"{key}:{'arrow' if as_arrow else 'json'}")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     try:
-        # Load dataset
-        if dataset.file_format == 'csv':
-            df = pd.read_csv(dataset.file_path)
-        elif dataset.file_format == 'json':
-            df = pd.read_json(dataset.file_path)
-        elif dataset.file_format == 'excel':
-            df = pd.read_excel(dataset.file_path)
-        elif dataset.file_format == 'parquet':
-            df = pd.read_parquet(dataset.file_path)
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Unsupported file format for visualization"
+        body = await result_cache.get(dataset_cache_tag(dataset), key)
+        if body is None:
+            # Served from the stored profile; only recomputed when the file changed
+            summary = await compute_executor.run(
+                "visualization.summary", current_user.id, load_dataset_summary, dataset
             )
-        
-        # Generate summary statistics
-        summary = {
-            "shape": list(df.shape),
-            "columns": list(df.columns),
-            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "numeric_summary": df.describe().to_dict() if len(df.select_dtypes(include=['number']).columns) > 0 else {},
-            "missing_values": df.isnull().sum().to_dict(),
-            "memory_usage": df.memory_usage(deep=True).sum()
-        }
-        
-        return summary
+            if db.is_modified(dataset):
+                await db.commit()
+            body = dumps(summary)
+            await result_cache.set(dataset_cache_tag(dataset), key, body)
+        if as_arrow:
+            return arrow_stream_response(summary_to_table(orjson.loads(body)), cache_headers(etag))
+        return Response(content=body, media_type="application/json", headers=cache_headers(etag))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -83,14 +148,15 @@ async def get_dataset_summary(
 async def create_chart(
     dataset_id: int,
     request: VisualizationRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Create a chart from dataset"""
-    dataset = db.query(Dataset).filter(
+    """Create a chart from dataset, reusing the figure rendered for an identical request"""
+    dataset = await db.scalar(select(Dataset).where(
         Dataset.id == dataset_id,
         Dataset.owner_id == current_user.id
-    ).first()
+    ))
     
     if not dataset:
         raise HTTPException(
@@ -98,60 +164,39 @@ async def create_chart(
             detail="Dataset not found"
         )
     
+    if dataset.file_format not in COLUMNAR_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format"
+        )
+    
+    key = chart_cache_key(request)
+    etag = result_cache.etag(dataset_cache_tag(dataset), key)
+    if etag_matches(http_request, etag):
+        return not_modified(etag)
+    
     try:
-        # Load dataset
-        if dataset.file_format == 'csv':
-            df = pd.read_csv(dataset.file_path)
-        elif dataset.file_format == 'json':
-            df = pd.read_json(dataset.file_path)
-        elif dataset.file_format == 'excel':
-            df = pd.read_excel(dataset.file_path)
-        elif dataset.file_format == 'parquet':
-            df = pd.read_parquet(dataset.file_path)
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Unsupported file format"
-            )
-        
-        # Create chart based on type
-        fig = None
-        
-        if request.chart_type == "bar" and request.x_column and request.y_column:
-            if request.aggregation:
-                df_agg = df.groupby(request.x_column)[request.y_column].agg(request.aggregation).reset_index()
-                fig = px.bar(df_agg, x=request.x_column, y=request.y_column)
-            else:
-                fig = px.bar(df, x=request.x_column, y=request.y_column, color=request.color_column)
-        
-        elif request.chart_type == "line" and request.x_column and request.y_column:
-            fig = px.line(df, x=request.x_column, y=request.y_column, color=request.color_column)
+        figure_json = await result_cache.get(dataset_cache_tag(dataset), key)
+        if figure_json is None:
+            try:
+                figure_json = await compute_executor.run(
+                    "visualization.chart", current_user.id, render_chart, dataset, request
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            # Record the columnar copy if the chart had to create it
+            if db.is_modified(dataset):
+                await db.commit()
+            await result_cache.set(dataset_cache_tag(dataset), key, figure_json.encode())
         
-        elif request.chart_type == "scatter" and request.x_column and request.y_column:
-            fig = px.scatter(df, x=request.x_column, y=request.y_column, color=request.color_column)
-        
-        elif request.chart_type == "histogram" and request.x_column:
-            fig = px.histogram(df, x=request.x_column)
-        
-        elif request.chart_type == "heatmap":
-            numeric_df = df.select_dtypes(include=['number'])
-            if len(numeric_df.columns) > 0:
-                fig = px.imshow(numeric_df.corr(), text_auto=True, aspect="auto")
-        
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid chart type or missing required columns"
-            )
-        
-        if fig:
-            return json.loads(fig.to_json())
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create chart"
-            )
+        # Return the serialized figure as-is instead of parsing it back into Python objects
+        return Response(content=figure_json, media_type="application/json", headers=cache_headers(etag))
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
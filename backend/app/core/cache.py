@@ -0,0 +1,160 @@
+"""In-process and shared caches"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time to live"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a live entry, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store an entry, evicting the least recently used ones beyond max_entries"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop an entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+def cache_key(params: dict) -> str:
+    """Stable digest of normalized request parameters"""
+    raw = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResultCache:
+    """Cache of rendered responses: an in-process LRU in front of an optional Redis tier.
+
+    Entries are tagged with the identity of the rows they were computed
+    from, such as a content hash. Changed rows get a new tag and so miss the
+    cache; ``invalidate`` drops everything derived from a tag once it goes
+    away.
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: int, max_entries: int, redis_url: Optional[str] = None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._local = TTLCache(ttl_seconds, max_entries)
+        self._redis = aioredis.from_url(redis_url) if redis_url else None
+        self._counts: Counter = Counter()
+
+    def _redis_key(self, tag: str, key: str) -> str:
+        return f"{self.namespace}:{tag}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.namespace}:tag:{tag}"
+
+    def etag(self, tag: Optional[str], key: str) -> Optional[str]:
+        """Strong ETag of an entry, known before its value is computed; None when uncacheable"""
+        if not tag:
+            return None
+        return '"' + hashlib.sha256(f"{tag}:{key}".encode()).hexdigest()[:32] + '"'
+
+    async def get(self, tag: Optional[str], key: str) -> Optional[bytes]:
+        """Get an entry from the local tier, falling back to Redis"""
+        if not tag:
+            return None
+        value = self._local.get((tag, key))
+        if value is not None:
+            self._counts["local_hits"] += 1
+            return value
+        if self._redis is not None:
+            try:
+                value = await self._redis.get(self._redis_key(tag, key))
+            except RedisError as e:
+                print(f"Result cache read failed: {e}")
+                value = None
+            if value is not None:
+                self._counts["redis_hits"] += 1
+                self._local.set((tag, key), value)
+                return value
+        self._counts["misses"] += 1
+        return None
+
+    async def set(self, tag: Optional[str], key: str, value: bytes):
+        """Store an entry in both tiers"""
+        if not tag:
+            return
+        self._local.set((tag, key), value)
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.set(self._redis_key(tag, key), value, ex=self.ttl_seconds)
+                    pipe.sadd(self._tag_key(tag), key)
+                    pipe.expire(self._tag_key(tag), self.ttl_seconds)
+                    await pipe.execute()
+            except RedisError as e:
+                print(f"Result cache write failed: {e}")
+
+    async def invalidate(self, tag: Optional[str]):
+        """Drop every entry computed from a dataset content hash"""
+        if not tag:
+            return
+        self._local.invalidate_where(lambda entry: entry[0] == tag)
+        if self._redis is not None:
+            try:
+                keys = await self._redis.smembers(self._tag_key(tag))
+                names = [self._redis_key(tag, key.decode()) for key in keys]
+                await self._redis.delete(self._tag_key(tag), *names)
+            except RedisError as e:
+                print(f"Result cache invalidation failed: {e}")
+
+    def stats(self) -> dict:
+        return {"redis": self._redis is not None, **self._counts}
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+
+result_cache = ResultCache(
+    "results",
+    settings.RESULT_CACHE_TTL_SECONDS,
+    settings.RESULT_CACHE_MAX_ENTRIES,
+    settings.REDIS_URL if settings.RESULT_CACHE_REDIS else None
+)
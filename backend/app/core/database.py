@@ -1,28 +1,148 @@
 """Database configuration and initialization"""
 
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, exc, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from pymongo import MongoClient
 from app.core.config import settings
 
-# PostgreSQL
-engine = create_engine(settings.DATABASE_URL)
+# Async driver used for each database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite"
+}
+
+
+class PoolMetricsMixin:
+    """Queue pool that counts checkouts which had to wait for a free connection"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self._metrics_lock = threading.Lock()
+    
+    def _do_get(self):
+        exhausted = (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.overflow() >= self._max_overflow
+        )
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            if exhausted:
+                with self._metrics_lock:
+                    self.waits += 1
+                    self.wait_seconds += time.perf_counter() - start
+    
+    def metrics(self) -> dict:
+        """Get connection counts and wait statistics"""
+        with self._metrics_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(0, self.overflow()),
+                "max_overflow": self._max_overflow,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 6),
+                "timeouts": self.timeouts
+            }
+
+
+class InstrumentedQueuePool(PoolMetricsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(PoolMetricsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def async_database_url(url: str) -> str:
+    """Get the async driver URL for a database URL"""
+    backend, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(backend.split("+")[0], backend) + separator + rest
+
+
+def engine_options(url: str, poolclass) -> dict:
+    """Pool settings for an engine; SQLite keeps its default pool"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING
+    }
+
+
+# PostgreSQL - sync engine for startup and background workers
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# PostgreSQL - async engine for request handlers
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool))
+# Objects stay loaded after commit so handlers can return them without another query
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # MongoDB
 mongo_client = MongoClient(settings.MONGODB_URL)
 mongodb = mongo_client.mlai_studio
 
 
-def get_db():
-    """Get PostgreSQL database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Get async PostgreSQL database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def pool_metrics() -> dict:
+    """Get connection pool metrics of both engines"""
+    metrics = {}
+    for name, pool in (("async", async_engine.sync_engine.pool), ("sync", engine.pool)):
+        metrics[name] = pool.metrics() if isinstance(pool, PoolMetricsMixin) else {"status": pool.status()}
+    return metrics
+
+
+def add_missing_columns(bind):
+    """Add model columns introduced since their table was created; create_all skips existing tables"""
+    inspector = inspect(bind)
+    quote = bind.dialect.identifier_preparer.quote
+    # Renders server defaults as CREATE TABLE would: string literals quoted, text() and expressions compiled
+    ddl_compiler = bind.dialect.ddl_compiler(bind.dialect, None)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=bind.dialect)}"
+                # Existing rows take the server default, which NOT NULL columns need
+                default = ddl_compiler.get_column_default_string(column)
+                if default is not None:
+                    ddl += f" DEFAULT {default}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                print(f"Added column {table.name}.{column.name}")
 
 
 async def init_db():
@@ -30,6 +150,11 @@ async def init_db():
     try:
         from app.models import user, project, dataset, model  # noqa
         Base.metadata.create_all(bind=engine)
+        add_missing_columns(engine)
+        # create_all skips existing tables, so add indexes introduced since they were created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         print("Database tables created successfully")
         
         # Create default test account if it doesn't exist
@@ -53,6 +178,17 @@ async def init_db():
                 print("Default test account created: username='testuser', password='testpass123'")
             else:
                 print("Default test account already exists")
+            
+            # Account used by requests without a token while authentication is disabled
+            if not db.query(User).filter(User.username == settings.DEFAULT_USERNAME).first():
+                db.add(User(
+                    username=settings.DEFAULT_USERNAME,
+                    email=f"{settings.DEFAULT_USERNAME}@example.com",
+                    full_name="User",
+                    is_active=True,
+                    hashed_password=get_password_hash("dummy")
+                ))
+                db.commit()
         except Exception as e:
             print(f"Error creating default test account: {e}")
             db.rollback()
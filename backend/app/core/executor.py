@@ -0,0 +1,169 @@
+"""Bounded executor for blocking work called from request handlers
+
+Parsing, profiling, plotting and prediction run on a shared thread pool so
+they never stall the event loop. Calls are admitted only while the queue
+has room: beyond ``COMPUTE_MAX_QUEUE`` waiting calls the server answers
+503, and a single user with ``COMPUTE_MAX_PER_CLIENT`` calls in flight
+gets 429, both with a Retry-After hint.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+# Latency samples kept per endpoint for percentiles
+LATENCY_WINDOW = 256
+
+
+class ExecutorSaturatedError(HTTPException):
+    """Raised when a call is not admitted to the executor"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+def _latency_summary(samples: deque) -> dict:
+    if not samples:
+        return {"avg": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 6),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 6),
+        "max": round(ordered[-1], 6)
+    }
+
+
+class EndpointStats:
+    """Queue and latency counters of one endpoint"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_seconds: deque = deque(maxlen=LATENCY_WINDOW)
+        self.run_seconds: deque = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "queue_seconds": _latency_summary(self.queue_seconds),
+            "run_seconds": _latency_summary(self.run_seconds)
+        }
+
+
+class ComputeExecutor:
+    """Thread pool with admission control and per-endpoint metrics.
+
+    Threads rather than processes: the heavy lifting happens in pandas,
+    pyarrow and numpy kernels that release the GIL, and some calls update
+    ORM objects owned by the request. Model training has its own process
+    pool in the training service.
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, max_per_client: int = None):
+        self.max_workers = max_workers or settings.COMPUTE_MAX_WORKERS
+        self.max_queue = max_queue if max_queue is not None else settings.COMPUTE_MAX_QUEUE
+        self.max_per_client = max_per_client or settings.COMPUTE_MAX_PER_CLIENT
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._per_client: Counter = Counter()
+        self._stats: Dict[str, EndpointStats] = {}
+
+    def _retry_after(self, stats: EndpointStats) -> int:
+        """Seconds until a slot is likely to free up, from recent run times"""
+        if not stats.run_seconds:
+            return 1
+        return max(1, math.ceil(sum(stats.run_seconds) / len(stats.run_seconds)))
+
+    def _admit(self, endpoint: str, client: Hashable) -> EndpointStats:
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            if self._pending >= self.max_workers + self.max_queue:
+                stats.rejected += 1
+                raise ExecutorSaturatedError(
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "Server is busy, please retry shortly",
+                    self._retry_after(stats)
+                )
+            if self._per_client[client] >= self.max_per_client:
+                stats.rejected += 1
+                raise ExecutorSaturatedError(
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    "Too many concurrent requests",
+                    self._retry_after(stats)
+                )
+            self._pending += 1
+            self._per_client[client] += 1
+            stats.submitted += 1
+            stats.in_flight += 1
+            return stats
+
+    def _release(self, stats: EndpointStats, client: Hashable, failed: bool):
+        with self._lock:
+            self._pending -= 1
+            self._per_client[client] -= 1
+            if self._per_client[client] <= 0:
+                del self._per_client[client]
+            stats.in_flight -= 1
+            if failed:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+
+    async def run(self, endpoint: str, client: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the pool, raising ExecutorSaturatedError when it is full"""
+        stats = self._admit(endpoint, client)
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    stats.queue_seconds.append(started - submitted)
+                    stats.run_seconds.append(time.perf_counter() - started)
+
+        try:
+            future = self._pool.submit(call)
+        except Exception:
+            self._release(stats, client, failed=True)
+            raise
+        # Runs once the call finishes, or is cancelled before it started
+        future.add_done_callback(
+            lambda done: self._release(stats, client, failed=done.cancelled() or done.exception() is not None)
+        )
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        """Get queue depth and per-endpoint counters and latencies"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "max_per_client": self.max_per_client,
+                "pending": self._pending,
+                "queued": max(0, self._pending - self.max_workers),
+                "endpoints": {name: stats.to_dict() for name, stats in self._stats.items()}
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+compute_executor = ComputeExecutor()
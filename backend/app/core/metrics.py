@@ -0,0 +1,22 @@
+"""Process resource metrics"""
+
+import os
+import resource
+import sys
+
+
+def current_rss_bytes() -> int:
+    """Get the resident memory of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Not on Linux; fall back to the peak, the closest portable figure
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Get the peak resident memory of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,92 @@
+"""Keyset pagination for list endpoints
+
+Pages are ordered newest first by ``(created_at, id)`` and continue from
+an opaque cursor instead of an offset, so each page is a single index
+range scan on the owner's ``(owner_id, created_at, id)`` index no matter
+how deep it is. Lists stay plain JSON arrays; the cursor of the next page
+and the optional total count travel in response headers.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Offset of the next page of a dataset query answered as an Arrow stream
+NEXT_OFFSET_HEADER = "X-Next-Offset"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+# Set when counting stopped at PAGINATION_COUNT_LIMIT, so the total is a lower bound
+TOTAL_CAPPED_HEADER = "X-Total-Count-Capped"
+PAGINATION_HEADERS = [NEXT_CURSOR_HEADER, NEXT_OFFSET_HEADER, TOTAL_COUNT_HEADER, TOTAL_CAPPED_HEADER]
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the position after a row as an opaque cursor"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+async def count_rows(db: AsyncSession, query: Select, entity) -> Tuple[int, bool]:
+    """Count the rows of a query, stopping at PAGINATION_COUNT_LIMIT"""
+    limited = query.with_only_columns(entity.id).order_by(None).limit(settings.PAGINATION_COUNT_LIMIT)
+    total = await db.scalar(select(func.count()).select_from(limited.subquery()))
+    return total, total >= settings.PAGINATION_COUNT_LIMIT
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    entity,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_total: bool = False,
+    scalars: bool = True
+) -> list:
+    """Get one page of a filtered query, newest first, setting the pagination headers.
+
+    With ``scalars=False`` the query may select extra columns after the
+    entity and whole rows are returned.
+    """
+    if include_total:
+        total, capped = await count_rows(db, query, entity)
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+        if capped:
+            response.headers[TOTAL_CAPPED_HEADER] = "true"
+
+    if cursor:
+        try:
+            created_at, row_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        query = query.where(tuple_(entity.created_at, entity.id) < tuple_(created_at, row_id))
+
+    # One extra row tells whether another page follows
+    result = await db.execute(query.order_by(entity.created_at.desc(), entity.id.desc()).limit(limit + 1))
+    rows = result.scalars().all() if scalars else result.all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1] if scalars else rows[-1][0]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return rows
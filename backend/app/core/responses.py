@@ -0,0 +1,121 @@
+"""Response encoders and content negotiation
+
+Data-heavy endpoints answer ``application/vnd.apache.arrow.stream`` when
+the client accepts it, streaming one record batch at a time, and JSON
+encoded with orjson otherwise. orjson serializes numpy arrays and scalars
+natively, so results skip the ``tolist()`` round trip through Python
+objects. Progress streams are server-sent events with JSON payloads.
+"""
+
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional
+
+import numpy as np
+import orjson
+import pyarrow as pa
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+
+def _default(obj: Any):
+    """Encode the types orjson does not handle natively"""
+    if isinstance(obj, np.ndarray):
+        # Object arrays, e.g. string class labels
+        return obj.tolist()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode JSON with orjson; NaN and infinity become null"""
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, including numpy arrays"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def sse_event(name: str, data: Any) -> bytes:
+    """Encode one server-sent event with a JSON payload"""
+    return b"event: " + name.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+def wants_arrow(request: Request) -> bool:
+    """Whether the client asked for an Arrow IPC stream"""
+    return ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Whether the client already holds the representation with this ETag"""
+    if etag is None:
+        return False
+    candidates = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def cache_headers(etag: Optional[str]) -> dict:
+    """Headers letting clients revalidate a cached response with If-None-Match"""
+    if etag is None:
+        return {}
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+class _ChunkSink:
+    """Writable file collecting what the IPC writer emits between yields"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_arrow_stream(schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """Encode record batches as an Arrow IPC stream, yielding each batch as soon as it is written"""
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    yield sink.drain()
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def arrow_stream_response(table: pa.Table, headers: dict = None) -> StreamingResponse:
+    """Stream a table as an Arrow IPC stream"""
+    return StreamingResponse(
+        iter_arrow_stream(table.schema, table.to_batches()),
+        media_type=ARROW_STREAM_MEDIA_TYPE,
+        headers=headers
+    )
@@ -2,13 +2,14 @@
 
 from app.models.user import User
 from app.models.project import Project
-from app.models.dataset import Dataset
+from app.models.dataset import Dataset, DatasetVersion
 from app.models.model import MLModel, ModelVersion, ModelExperiment
 
 __all__ = [
     "User",
     "Project",
     "Dataset",
+    "DatasetVersion",
     "MLModel",
     "ModelVersion",
     "ModelExperiment"
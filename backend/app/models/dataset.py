@@ -1,7 +1,7 @@
 """Dataset model"""
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, BigInteger
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, BigInteger, Index, UniqueConstraint
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 from app.core.database import Base
 
@@ -9,17 +9,28 @@ from app.core.database import Base
 class Dataset(Base):
     """Dataset model"""
     __tablename__ = "datasets"
+    __table_args__ = (
+        # Keyset pagination of a user's datasets, overall and per project
+        Index("ix_datasets_owner_created", "owner_id", "created_at", "id"),
+        Index("ix_datasets_project_created", "project_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
     description = Column(Text, nullable=True)
-    file_path = Column(String, nullable=False)
+    file_path = Column(String, nullable=False, index=True)  # Content-addressed blob, shared by identical uploads
     file_format = Column(String, nullable=False)  # csv, json, excel, parquet, etc.
     file_size = Column(BigInteger, nullable=False)  # in bytes
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the uploaded file
+    columnar_path = Column(String, nullable=True)  # Memory-mappable Arrow IPC copy of the file
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # 1 for the upload, +1 per append
+    partitions = Column(JSON, default=list)  # Columnar files of appended rows, oldest first
     row_count = Column(Integer, nullable=True)
     column_count = Column(Integer, nullable=True)
     schema = Column(JSON, nullable=True)  # Column names, types, etc.
     extra_metadata = Column(JSON, default=dict)  # Additional metadata (renamed from 'metadata' to avoid SQLAlchemy conflict)
+    # Mergeable profile state, several KB per column; loaded only to extend the profile
+    sketches = deferred(Column(JSON, nullable=True))
     tags = Column(JSON, default=list)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -28,4 +39,32 @@ class Dataset(Base):
     
     # Relationships
     project = relationship("Project", back_populates="datasets")
+    versions = relationship(
+        "DatasetVersion",
+        back_populates="dataset",
+        cascade="all, delete-orphan",
+        order_by="DatasetVersion.version"
+    )
+
+
+class DatasetVersion(Base):
+    """Dataset Version model; each version after the first appends one partition"""
+    __tablename__ = "dataset_versions"
+    __table_args__ = (
+        UniqueConstraint("dataset_id", "version", name="uq_dataset_versions_dataset_version"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    dataset_id = Column(Integer, ForeignKey("datasets.id"), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # sha256 of the appended file
+    file_format = Column(String, nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    partition_path = Column(String, nullable=False)  # Arrow IPC file holding the appended rows
+    row_count = Column(Integer, nullable=False)  # Rows added by this version
+    total_row_count = Column(Integer, nullable=False)  # Rows of the dataset as of this version
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    dataset = relationship("Dataset", back_populates="versions")
 
@@ -1,6 +1,6 @@
 """ML Model models"""
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -9,6 +9,11 @@ from app.core.database import Base
 class MLModel(Base):
     """ML Model model"""
     __tablename__ = "ml_models"
+    __table_args__ = (
+        # Keyset pagination of a user's models, overall and per project
+        Index("ix_ml_models_owner_created", "owner_id", "created_at", "id"),
+        Index("ix_ml_models_project_created", "project_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -30,6 +35,10 @@ class MLModel(Base):
 class ModelVersion(Base):
     """Model Version model"""
     __tablename__ = "model_versions"
+    __table_args__ = (
+        # Latest version of a model
+        Index("ix_model_versions_model_latest", "model_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     version = Column(String, nullable=False)  # e.g., "1.0.0"
@@ -53,7 +62,8 @@ class ModelExperiment(Base):
     description = Column(Text, nullable=True)
     metrics = Column(JSON, default=dict)
     hyperparameters = Column(JSON, default=dict)
-    status = Column(String, default="running")  # running, completed, failed
+    status = Column(String, default="running")  # queued, running, completed, failed, cancelled
+    resource_usage = Column(JSON, nullable=True)  # Wall and CPU time and peak memory of the training job
     model_id = Column(Integer, ForeignKey("ml_models.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
@@ -1,6 +1,6 @@
 """Project model"""
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -9,6 +9,10 @@ from app.core.database import Base
 class Project(Base):
     """Project model"""
     __tablename__ = "projects"
+    __table_args__ = (
+        # Keyset pagination of a user's projects
+        Index("ix_projects_owner_created", "owner_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -0,0 +1,224 @@
+"""Training algorithm registry
+
+Each algorithm knows how to build its estimator for a model type, with its
+thread count taken from the job's ``n_jobs``. Boosters use histogram-based
+tree construction and stop early on a validation split carved off the
+training rows; algorithms with built-in early stopping hold out their own.
+XGBoost and LightGBM are imported on first use, so processes that never
+train them do not load them.
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor
+)
+from sklearn.linear_model import LogisticRegression, Ridge, SGDClassifier, SGDRegressor
+from sklearn.neural_network import MLPClassifier, MLPRegressor
+from sklearn.preprocessing import LabelEncoder
+
+MODEL_TYPES = ("classification", "regression")
+# Boosting rounds without validation improvement before training stops
+EARLY_STOPPING_ROUNDS = 20
+
+
+class LabelEncodedClassifier(BaseEstimator, ClassifierMixin):
+    """Classifier wrapper mapping arbitrary labels to the 0..n-1 codes XGBoost expects"""
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def fit(self, X, y, eval_set=None, **fit_params):
+        self.encoder_ = LabelEncoder().fit(y)
+        self.classes_ = self.encoder_.classes_
+        if eval_set is not None:
+            fit_params["eval_set"] = [(X_val, self.encoder_.transform(y_val)) for X_val, y_val in eval_set]
+        self.estimator.fit(X, self.encoder_.transform(y), **fit_params)
+        return self
+
+    def predict(self, X):
+        return self.encoder_.inverse_transform(np.asarray(self.estimator.predict(X)).astype(int))
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(X)
+
+
+class Algorithm:
+    """How to build and fit one training algorithm.
+
+    ``eval_fit_params`` builds the fit arguments of algorithms that stop
+    early on an external validation set; the others are fitted as-is,
+    holding out their own validation rows if ``early_stopping`` is set.
+    ``categorical_encoding`` replaces the default one-hot/hashing choice
+    for estimators that need dense input.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[str, dict, int], Any],
+        eval_fit_params: Optional[Callable[[Any, Any, dict], dict]] = None,
+        categorical_encoding: Optional[str] = None,
+        dense: bool = False,
+        early_stopping: bool = False
+    ):
+        self.build = build
+        self.eval_fit_params = eval_fit_params
+        self.categorical_encoding = categorical_encoding
+        self.dense = dense
+        self.early_stopping = early_stopping or eval_fit_params is not None
+
+    @property
+    def uses_eval_set(self) -> bool:
+        return self.eval_fit_params is not None
+
+
+def _random_forest(model_type: str, hp: dict, random_state: int):
+    estimator = RandomForestClassifier if model_type == "classification" else RandomForestRegressor
+    return estimator(
+        n_estimators=hp.get("n_estimators", 100),
+        max_depth=hp.get("max_depth", None),
+        n_jobs=hp.get("n_jobs"),
+        random_state=random_state
+    )
+
+
+def _xgboost(model_type: str, hp: dict, random_state: int):
+    import xgboost
+
+    params = dict(
+        tree_method="hist",
+        n_estimators=hp.get("n_estimators", 1000),
+        learning_rate=hp.get("learning_rate", 0.1),
+        max_depth=hp.get("max_depth", 6),
+        max_bin=hp.get("max_bin", 256),
+        subsample=hp.get("subsample", 1.0),
+        colsample_bytree=hp.get("colsample_bytree", 1.0),
+        early_stopping_rounds=hp.get("early_stopping_rounds", EARLY_STOPPING_ROUNDS),
+        n_jobs=hp.get("n_jobs"),
+        random_state=random_state
+    )
+    if model_type == "classification":
+        return LabelEncodedClassifier(xgboost.XGBClassifier(**params))
+    return xgboost.XGBRegressor(**params)
+
+
+def _xgboost_fit_params(X_val, y_val, hp: dict) -> dict:
+    return {"eval_set": [(X_val, y_val)], "verbose": False}
+
+
+def _lightgbm(model_type: str, hp: dict, random_state: int):
+    import lightgbm
+
+    estimator = lightgbm.LGBMClassifier if model_type == "classification" else lightgbm.LGBMRegressor
+    return estimator(
+        n_estimators=hp.get("n_estimators", 1000),
+        learning_rate=hp.get("learning_rate", 0.1),
+        num_leaves=hp.get("num_leaves", 31),
+        max_depth=hp.get("max_depth", -1),
+        max_bin=hp.get("max_bin", 255),
+        subsample=hp.get("subsample", 1.0),
+        colsample_bytree=hp.get("colsample_bytree", 1.0),
+        n_jobs=hp.get("n_jobs"),
+        random_state=random_state,
+        verbose=-1
+    )
+
+
+def _lightgbm_fit_params(X_val, y_val, hp: dict) -> dict:
+    import lightgbm
+
+    rounds = hp.get("early_stopping_rounds", EARLY_STOPPING_ROUNDS)
+    return {"eval_set": [(X_val, y_val)], "callbacks": [lightgbm.early_stopping(rounds, verbose=False)]}
+
+
+def _hist_gradient_boosting(model_type: str, hp: dict, random_state: int):
+    # Threads come from OpenMP, capped by the job's threadpool limits
+    estimator = HistGradientBoostingClassifier if model_type == "classification" else HistGradientBoostingRegressor
+    return estimator(
+        max_iter=hp.get("max_iter", 1000),
+        learning_rate=hp.get("learning_rate", 0.1),
+        max_leaf_nodes=hp.get("max_leaf_nodes", 31),
+        max_depth=hp.get("max_depth", None),
+        max_bins=hp.get("max_bins", 255),
+        early_stopping=True,
+        validation_fraction=hp.get("validation_fraction", 0.1),
+        n_iter_no_change=hp.get("early_stopping_rounds", EARLY_STOPPING_ROUNDS),
+        random_state=random_state
+    )
+
+
+def _linear(model_type: str, hp: dict, random_state: int):
+    if model_type == "classification":
+        return LogisticRegression(
+            C=hp.get("C", 1.0),
+            max_iter=hp.get("max_iter", 1000),
+            n_jobs=hp.get("n_jobs"),
+            random_state=random_state
+        )
+    return Ridge(alpha=hp.get("alpha", 1.0), random_state=random_state)
+
+
+def _sgd(model_type: str, hp: dict, random_state: int):
+    params = dict(
+        alpha=hp.get("alpha", 1e-4),
+        max_iter=hp.get("max_iter", 1000),
+        early_stopping=True,
+        validation_fraction=hp.get("validation_fraction", 0.1),
+        n_iter_no_change=hp.get("n_iter_no_change", 5),
+        random_state=random_state
+    )
+    if model_type == "classification":
+        return SGDClassifier(loss=hp.get("loss", "log_loss"), n_jobs=hp.get("n_jobs"), **params)
+    return SGDRegressor(loss=hp.get("loss", "squared_error"), **params)
+
+
+def _neural_network(model_type: str, hp: dict, random_state: int):
+    estimator = MLPClassifier if model_type == "classification" else MLPRegressor
+    return estimator(
+        hidden_layer_sizes=tuple(hp.get("hidden_layer_sizes", (100,))),
+        alpha=hp.get("alpha", 1e-4),
+        learning_rate_init=hp.get("learning_rate", 1e-3),
+        max_iter=hp.get("max_iter", 200),
+        early_stopping=True,
+        validation_fraction=hp.get("validation_fraction", 0.1),
+        random_state=random_state
+    )
+
+
+ALGORITHMS: Dict[str, Algorithm] = {
+    "random_forest": Algorithm(_random_forest),
+    "xgboost": Algorithm(_xgboost, _xgboost_fit_params),
+    "lightgbm": Algorithm(_lightgbm, _lightgbm_fit_params),
+    # Needs dense input, so categoricals are ordinal codes instead of wide one-hot matrices
+    "hist_gradient_boosting": Algorithm(
+        _hist_gradient_boosting, categorical_encoding="ordinal", dense=True, early_stopping=True
+    ),
+    "linear": Algorithm(_linear),
+    "sgd": Algorithm(_sgd, early_stopping=True),
+    "neural_network": Algorithm(_neural_network, early_stopping=True)
+}
+
+
+def get_algorithm(name: str, model_type: str) -> Algorithm:
+    """Look up an algorithm, raising ValueError if it cannot train this model type"""
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Unsupported model type: {model_type}")
+    if name not in ALGORITHMS:
+        raise ValueError(f"Unsupported algorithm: {name}")
+    return ALGORITHMS[name]
+
+
+def fitted_iterations(estimator) -> Optional[int]:
+    """Boosting rounds or epochs actually run, once early stopping kicked in"""
+    if isinstance(estimator, LabelEncodedClassifier):
+        estimator = estimator.estimator
+    for attr in ("best_iteration", "best_iteration_", "n_iter_"):
+        value = getattr(estimator, attr, None)
+        if value is not None:
+            return int(np.max(value))
+    return None
@@ -0,0 +1,184 @@
+"""Chart aggregation and downsampling
+
+Charts are reduced server-side before plotting so a figure never carries
+more than a fixed point budget, whatever the size of the dataset:
+scatter plots become 2D density heatmaps, line series are decimated with
+LTTB or min/max bucketing and histograms are binned with numpy.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from app.core.config import settings
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Select point indices with the Largest-Triangle-Three-Buckets algorithm"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # First and last points are always kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(area.argmax())
+        indices[i + 1] = selected
+    return indices
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Select the minimum and maximum point of each bucket"""
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+    edges = np.linspace(0, n, threshold // 2 + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            segment = y[start:end]
+            indices.extend((start + int(segment.argmin()), start + int(segment.argmax())))
+    return np.unique(indices)
+
+
+def _as_numeric(values: pd.Series) -> Optional[np.ndarray]:
+    """Get a float view of numeric or datetime values, or None for other types"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("int64").to_numpy(dtype=np.float64)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    return None
+
+
+def downsample_series(df: pd.DataFrame, x: str, y: str, threshold: int) -> pd.DataFrame:
+    """Decimate a single line series to at most ``threshold`` points"""
+    df = df.dropna(subset=[x, y])
+    if len(df) <= threshold:
+        return df
+    x_values = _as_numeric(df[x])
+    if x_values is not None:
+        order = np.argsort(x_values, kind="stable")
+        df = df.iloc[order]
+        x_values = x_values[order]
+    else:
+        x_values = np.arange(len(df), dtype=np.float64)
+    y_values = df[y].to_numpy(dtype=np.float64)
+    if settings.CHART_LINE_DOWNSAMPLER == "minmax":
+        indices = minmax_indices(y_values, threshold)
+    else:
+        indices = lttb_indices(x_values, y_values, threshold)
+    return df.iloc[indices]
+
+
+def line_chart(df: pd.DataFrame, x: str, y: str, color: Optional[str], point_budget: int) -> go.Figure:
+    """Line chart with each series decimated to its share of the point budget"""
+    if color:
+        groups = [group for _, group in df.groupby(color, sort=False, observed=True)]
+        threshold = max(3, point_budget // max(len(groups), 1))
+        df = pd.concat([downsample_series(group, x, y, threshold) for group in groups])
+    else:
+        df = downsample_series(df, x, y, point_budget)
+    return px.line(df, x=x, y=y, color=color)
+
+
+def scatter_chart(df: pd.DataFrame, x: str, y: str, color: Optional[str], point_budget: int) -> go.Figure:
+    """Scatter plot, switching to a binned density heatmap above the point budget"""
+    if len(df) <= point_budget:
+        return px.scatter(df, x=x, y=y, color=color)
+
+    df = df.dropna(subset=[x, y])
+    if len(df) <= point_budget:
+        return px.scatter(df, x=x, y=y, color=color)
+    x_values = _as_numeric(df[x])
+    y_values = _as_numeric(df[y])
+    if color or x_values is None or y_values is None:
+        # Density cannot show a color dimension or categorical axes; sample instead
+        return px.scatter(df.sample(n=point_budget, random_state=0), x=x, y=y, color=color)
+
+    mask = np.isfinite(x_values) & np.isfinite(y_values)
+    bins = settings.CHART_DENSITY_BINS
+    counts, x_edges, y_edges = np.histogram2d(x_values[mask], y_values[mask], bins=bins)
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        # histogram2d indexes counts by [x, y]; heatmaps expect rows along y
+        z=np.where(counts.T > 0, counts.T, np.nan),
+        colorscale="Viridis",
+        colorbar={"title": "count"}
+    ))
+    fig.update_layout(xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def histogram_chart(df: pd.DataFrame, x: str, point_budget: int) -> go.Figure:
+    """Histogram pre-binned server-side"""
+    values = _as_numeric(df[x].dropna())
+    if values is None:
+        counts = df[x].value_counts().head(point_budget)
+        fig = go.Figure(go.Bar(x=counts.index.astype(str), y=counts.to_numpy()))
+    else:
+        counts, edges = np.histogram(values[np.isfinite(values)], bins=min(settings.CHART_HISTOGRAM_BINS, point_budget))
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+        fig.update_layout(bargap=0)
+    fig.update_layout(xaxis_title=x, yaxis_title="count")
+    return fig
+
+
+def bar_chart(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    color: Optional[str],
+    aggregation: Optional[str],
+    point_budget: int
+) -> go.Figure:
+    """Bar chart, summing stacked rows once they exceed the point budget"""
+    if aggregation:
+        df = df.groupby(x, observed=True)[y].agg(aggregation).reset_index()
+        return px.bar(df.head(point_budget), x=x, y=y)
+    if len(df) > point_budget:
+        # Plotly stacks bars sharing an x value, so their sum draws the same chart
+        keys = [x, color] if color else [x]
+        df = df.groupby(keys, sort=False, observed=True)[y].sum().reset_index().head(point_budget)
+    return px.bar(df, x=x, y=y, color=color)
+
+
+def build_chart(
+    df: pd.DataFrame,
+    chart_type: str,
+    x: Optional[str] = None,
+    y: Optional[str] = None,
+    color: Optional[str] = None,
+    aggregation: Optional[str] = None,
+    point_budget: Optional[int] = None
+) -> go.Figure:
+    """Build a figure whose traces stay within the point budget"""
+    point_budget = min(point_budget or settings.CHART_POINT_BUDGET, settings.CHART_POINT_BUDGET)
+
+    if chart_type == "bar" and x and y:
+        return bar_chart(df, x, y, color, aggregation, point_budget)
+    elif chart_type == "line" and x and y:
+        return line_chart(df, x, y, color, point_budget)
+    elif chart_type == "scatter" and x and y:
+        return scatter_chart(df, x, y, color, point_budget)
+    elif chart_type == "histogram" and x:
+        return histogram_chart(df, x, point_budget)
+    elif chart_type == "heatmap":
+        numeric_df = df.select_dtypes(include=['number'])
+        if len(numeric_df.columns) > 0:
+            return px.imshow(numeric_df.corr(), text_auto=True, aspect="auto")
+    raise ValueError("Invalid chart type or missing required columns")
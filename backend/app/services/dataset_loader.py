@@ -0,0 +1,313 @@
+"""Raw dataset file loading
+
+Every raw upload is read through this module, which uses the fastest
+engine for each format:
+
+- CSV: pyarrow's multithreaded parser
+- Parquet: row groups read with only the requested columns
+- JSON lines: blocks of lines parsed by pyarrow's JSON reader; JSON
+  documents (one top-level array or object) are parsed whole by pandas
+- Excel: openpyxl in read-only mode, converted a chunk of rows at a time
+
+All readers take the same hints: ``columns`` to project, a ``limit`` on
+rows and ``dtypes`` overrides mapping columns to Arrow types or their
+names. Hints are applied while parsing where the engine supports it and
+right after each block is read otherwise.
+
+``to_compact_frame`` converts Arrow data to pandas with compact dtypes:
+downcasts and categoricals chosen per column, Arrow-backed strings and
+nullable booleans instead of Python object columns.
+"""
+
+import io
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+
+LOADER_FORMATS = ('csv', 'json', 'excel', 'parquet')
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'json',
+    '.ndjson': 'json',
+    '.xlsx': 'excel',
+    '.xls': 'excel',
+    '.parquet': 'parquet',
+    '.pkl': 'pickle',
+    '.h5': 'hdf5'
+}
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+
+DType = Union[str, pa.DataType]
+
+
+def format_for_path(file_path: str) -> str:
+    """Get the file format of a path from its extension"""
+    return FORMAT_EXTENSIONS.get(Path(file_path).suffix.lower(), 'unknown')
+
+
+def resolve_dtype(dtype: DType) -> pa.DataType:
+    """Get the Arrow type for a dtype override such as ``"int32"`` or ``"category"``"""
+    if isinstance(dtype, pa.DataType):
+        return dtype
+    if dtype == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    try:
+        return pa.type_for_alias(dtype)
+    except ValueError:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+
+
+def _resolve_dtypes(dtypes: Optional[Dict[str, DType]]) -> Dict[str, pa.DataType]:
+    return {column: resolve_dtype(dtype) for column, dtype in (dtypes or {}).items()}
+
+
+def _apply_hints(table: pa.Table, columns: Optional[List[str]], dtypes: Dict[str, pa.DataType]) -> pa.Table:
+    """Project and cast a table the engine could not project or type while parsing"""
+    if columns is not None:
+        missing = [col for col in columns if table.schema.get_field_index(col) == -1]
+        if missing:
+            raise ValueError(f"Unknown columns: {missing}")
+        table = table.select(columns)
+    for name, dtype in dtypes.items():
+        index = table.schema.get_field_index(name)
+        if index == -1 or table.schema.field(index).type == dtype:
+            continue
+        column = table.column(index)
+        try:
+            if pa.types.is_dictionary(dtype) and not pa.types.is_dictionary(column.type):
+                column = column.dictionary_encode()
+            else:
+                # Safe casts: values that do not fit the type raise instead of wrapping
+                column = column.cast(dtype)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Cannot read column {name} as {dtype}: {e}")
+        table = table.set_column(index, name, column)
+    return table
+
+
+def frame_to_table(frame: pd.DataFrame) -> pa.Table:
+    """Convert a pandas frame to Arrow, storing object columns of mixed types as strings"""
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    frame = frame.copy(deep=False)
+    for col in frame.columns:
+        if frame[col].dtype != object:
+            continue
+        try:
+            pa.array(frame[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Values such as [1, "x", 2.5] have no common Arrow type; missing values stay null
+            frame[col] = frame[col].astype("string")
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def _limit_batches(batches: Iterator[pa.RecordBatch], limit: Optional[int]) -> Iterator[pa.RecordBatch]:
+    if limit is None:
+        yield from batches
+        return
+    remaining = limit
+    for batch in batches:
+        if remaining <= 0:
+            return
+        yield batch.slice(0, remaining)
+        remaining -= batch.num_rows
+
+
+def _hinted_batches(tables: Iterator[pa.Table], columns, dtypes) -> Iterator[pa.RecordBatch]:
+    for table in tables:
+        yield from _apply_hints(table, columns, dtypes).to_batches()
+
+
+def _csv_options(columns, dtypes):
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=settings.DATASET_READ_BLOCK_BYTES)
+    convert_options = pa_csv.ConvertOptions(include_columns=columns or [], column_types=dtypes)
+    return read_options, convert_options
+
+
+def _is_json_lines(file_path: str) -> bool:
+    """Whether a JSON file holds one record per line rather than one document"""
+    if Path(file_path).suffix.lower() in JSON_LINES_EXTENSIONS:
+        return True
+    with open(file_path, "rb") as f:
+        lines = (line for line in f if line.strip())
+        first, second = next(lines, None), next(lines, None)
+    # A single line is one document, such as pandas' default to_json output
+    if first is None or second is None:
+        return False
+    try:
+        return all(isinstance(json.loads(line), dict) for line in (first, second))
+    except ValueError:
+        # The first line of a document spanning lines is not valid JSON on its own
+        return False
+
+
+def _iter_json_lines(file_path: str) -> Iterator[pa.Table]:
+    """Parse JSON lines a block at a time, every block typed like the first"""
+    parse_options = None
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(settings.DATASET_READ_BLOCK_BYTES)
+            if not block:
+                return
+            # Finish the last line so each block parses on its own
+            block += f.readline()
+            if not block.strip():
+                continue
+            # Fields or types the first block did not show raise ArrowInvalid
+            table = pa_json.read_json(io.BytesIO(block), parse_options=parse_options)
+            if parse_options is None:
+                parse_options = pa_json.ParseOptions(explicit_schema=table.schema, unexpected_field_behavior="error")
+            yield table
+
+
+def _excel_header(values) -> List[str]:
+    """Column names for an Excel header row, named and de-duplicated like pandas"""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _iter_excel(file_path: str, columns: Optional[List[str]]) -> Iterator[pa.Table]:
+    """Convert the first worksheet a chunk of rows at a time"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = _excel_header(header)
+        while True:
+            chunk = list(islice(rows, settings.DATASET_READ_CHUNK_ROWS))
+            if not chunk:
+                return
+            frame = pd.DataFrame.from_records(chunk, columns=names)
+            yield frame_to_table(frame[columns] if columns is not None else frame)
+    finally:
+        workbook.close()
+
+
+def iter_file_batches(
+    file_path: str,
+    file_format: str,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    dtypes: Optional[Dict[str, DType]] = None
+) -> Iterator[pa.RecordBatch]:
+    """Stream a raw dataset file as Arrow record batches.
+
+    CSV and JSON lines types are inferred from the first block; a later
+    block that does not fit raises ``pa.ArrowInvalid``, after which callers
+    can fall back to ``read_file_table``.
+    """
+    dtypes = _resolve_dtypes(dtypes)
+    if file_format == 'csv':
+        read_options, convert_options = _csv_options(columns, dtypes)
+        batches = pa_csv.open_csv(file_path, read_options=read_options, convert_options=convert_options)
+    elif file_format == 'parquet':
+        parquet_file = pq.ParquetFile(file_path)
+        batches = _hinted_batches(
+            (pa.Table.from_batches([batch]) for batch in parquet_file.iter_batches(columns=columns)),
+            columns, dtypes
+        )
+    elif file_format == 'json' and _is_json_lines(file_path):
+        batches = _hinted_batches(_iter_json_lines(file_path), columns, dtypes)
+    elif file_format == 'excel':
+        batches = _hinted_batches(_iter_excel(file_path, columns), None, dtypes)
+    else:
+        batches = read_file_table(file_path, file_format, columns, None, dtypes).to_batches()
+    return _limit_batches(iter(batches), limit)
+
+
+def read_file_table(
+    file_path: str,
+    file_format: str,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    dtypes: Optional[Dict[str, DType]] = None
+) -> pa.Table:
+    """Read a whole raw dataset file into one Arrow table, inferring types over all of it"""
+    if file_format not in LOADER_FORMATS:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    if limit is not None:
+        # Streaming readers stop at the limit instead of parsing the whole file
+        batches = list(iter_file_batches(file_path, file_format, columns, limit, dtypes))
+        return pa.Table.from_batches(batches) if batches else pa.table({})
+    dtypes = _resolve_dtypes(dtypes)
+    if file_format == 'csv':
+        read_options, convert_options = _csv_options(columns, dtypes)
+        return pa_csv.read_csv(file_path, read_options=read_options, convert_options=convert_options)
+    elif file_format == 'parquet':
+        table = pq.read_table(file_path, columns=columns)
+    elif file_format == 'excel':
+        table = frame_to_table(pd.read_excel(file_path, usecols=columns))
+    elif _is_json_lines(file_path):
+        try:
+            table = pa_json.read_json(
+                file_path,
+                read_options=pa_json.ReadOptions(use_threads=True, block_size=settings.DATASET_READ_BLOCK_BYTES)
+            )
+        except pa.ArrowInvalid:
+            # Records whose types conflict across the file; pandas falls back to object columns
+            table = frame_to_table(pd.read_json(file_path, lines=True))
+    else:
+        try:
+            frame = pd.read_json(file_path)
+        except ValueError:
+            # A .json file holding a single JSON lines record
+            frame = pd.read_json(file_path, lines=True)
+        table = frame_to_table(frame)
+    return _apply_hints(table, columns, dtypes)
+
+
+def _pandas_type(data_type: pa.DataType):
+    if data_type == pa.string() or data_type == pa.large_string():
+        return pd.StringDtype("pyarrow")
+    if data_type == pa.bool_():
+        return pd.BooleanDtype()
+    return None
+
+
+def compact_pandas_dtypes(schema: pa.Schema, dtypes: Dict[str, DType]) -> Dict[str, str]:
+    """Names of the pandas dtypes ``to_compact_frame`` produces for a schema"""
+    base = schema.empty_table().to_pandas(types_mapper=_pandas_type).dtypes
+    # Compact dtype names are pandas dtype names too
+    return {col: str(dtypes.get(col, dtype)) for col, dtype in base.items()}
+
+
+def to_compact_frame(table: pa.Table, dtypes: Dict[str, DType]) -> pd.DataFrame:
+    """Convert a table to pandas, casting columns to their compact dtypes first"""
+    table = _apply_hints(table, None, _resolve_dtypes(dtypes))
+    # Dictionary columns become pandas categoricals
+    return table.to_pandas(types_mapper=_pandas_type)
+
+
+def read_file_frame(
+    file_path: str,
+    file_format: str,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    dtypes: Optional[Dict[str, DType]] = None
+) -> pd.DataFrame:
+    """Read a raw dataset file into pandas through the fastest reader for its format"""
+    return read_file_table(file_path, file_format, columns, limit, dtypes).to_pandas()
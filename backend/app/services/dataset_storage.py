@@ -0,0 +1,218 @@
+"""Columnar dataset storage
+
+Uploaded files are converted once into an uncompressed Arrow IPC file
+stored under their content hash. Reads memory-map that copy, so callers
+only page in the columns they select instead of re-parsing the raw file.
+Rows appended later are kept as separate partitions laid out like the
+first copy; reads concatenate the parts without copying them. Functions
+taking a ``columnar_path`` also accept a list of parts. Frames are loaded
+with the compact dtypes the dataset's profile chose.
+"""
+
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import settings
+from app.services.dataset_loader import LOADER_FORMATS, iter_file_batches, read_file_table, to_compact_frame
+from app.services.upload_service import hash_file
+
+COLUMNAR_DIR = Path(settings.COLUMNAR_DIR)
+COLUMNAR_DIR.mkdir(parents=True, exist_ok=True)
+PARTITION_DIR = COLUMNAR_DIR / "partitions"
+
+# Raw formats that can be converted to a columnar copy
+COLUMNAR_FORMATS = LOADER_FORMATS
+
+
+def get_columnar_path(content_hash: str) -> Path:
+    """Get the content-addressed path of a columnar copy"""
+    return COLUMNAR_DIR / f"{content_hash}.arrow"
+
+
+def new_partition_path(dataset_id: int, version: int) -> Path:
+    """Get a fresh path for the partition appended by a dataset version"""
+    return PARTITION_DIR / str(dataset_id) / f"v{version}-{uuid.uuid4().hex}.arrow"
+
+
+def _as_parts(columnar_path) -> List[Path]:
+    if isinstance(columnar_path, (list, tuple)):
+        return [Path(part) for part in columnar_path]
+    return [Path(columnar_path)]
+
+
+def _write_ipc_file(batches: Iterator[pa.RecordBatch], dest_path: Path):
+    """Write record batches to an Arrow IPC file"""
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pa.ipc.new_file(str(dest_path), batch.schema)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Dataset is empty")
+
+
+def convert_to_columnar(file_path: str, file_format: str, content_hash: str) -> Path:
+    """Convert a raw dataset file into its columnar copy, once per content hash"""
+    dest_path = get_columnar_path(content_hash)
+    if dest_path.exists():
+        return dest_path
+
+    tmp_path = dest_path.with_suffix(".arrow.tmp")
+    try:
+        try:
+            _write_ipc_file(iter_file_batches(file_path, file_format), tmp_path)
+        except pa.ArrowInvalid:
+            # Streaming readers infer types from the first block; re-parse in
+            # full when a later block does not fit the inferred schema
+            _write_ipc_file(iter(read_file_table(file_path, file_format).to_batches()), tmp_path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(dest_path)
+    return dest_path
+
+
+def _conform_batches(batches: Iterator[pa.RecordBatch], schema: pa.Schema) -> Iterator[pa.RecordBatch]:
+    """Reorder and cast appended batches to an existing dataset schema"""
+    for batch in batches:
+        missing = [name for name in schema.names if batch.schema.get_field_index(name) == -1]
+        extra = [name for name in batch.schema.names if schema.get_field_index(name) == -1]
+        if missing or extra:
+            raise ValueError(f"Appended columns do not match the dataset: missing {missing}, unexpected {extra}")
+        table = pa.Table.from_batches([batch]).select(schema.names)
+        try:
+            yield from table.cast(schema).to_batches()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Appended rows do not fit the dataset schema: {e}")
+
+
+def convert_partition(file_path: str, file_format: str, schema: pa.Schema, dest_path: Path) -> Path:
+    """Convert a file of appended rows into a columnar partition with the dataset's schema"""
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_path.with_suffix(".arrow.tmp")
+    # Parse straight into the dataset's types instead of inferring them again
+    dtypes = {field.name: field.type for field in schema}
+    try:
+        try:
+            _write_ipc_file(_conform_batches(iter_file_batches(file_path, file_format, dtypes=dtypes), schema), tmp_path)
+        except pa.ArrowInvalid:
+            batches = read_file_table(file_path, file_format, dtypes=dtypes).to_batches()
+            _write_ipc_file(_conform_batches(iter(batches), schema), tmp_path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(dest_path)
+    return dest_path
+
+
+def ensure_columnar_copy(dataset) -> Path:
+    """Get a dataset's columnar copy, converting the raw file if it has none yet.
+
+    Updates ``content_hash``/``columnar_path`` on the dataset when they are
+    filled in; the caller is responsible for committing.
+    """
+    if dataset.columnar_path and Path(dataset.columnar_path).exists():
+        return Path(dataset.columnar_path)
+    if not dataset.content_hash:
+        dataset.content_hash = hash_file(Path(dataset.file_path))
+    columnar_path = convert_to_columnar(dataset.file_path, dataset.file_format, dataset.content_hash)
+    dataset.columnar_path = str(columnar_path)
+    return columnar_path
+
+
+def dataset_parts(dataset, version: Optional[int] = None) -> List[Path]:
+    """Get the columnar files holding a dataset's rows as of a version, oldest first.
+
+    Defaults to the latest version. May fill in the first columnar copy,
+    like ``ensure_columnar_copy``.
+    """
+    partitions = dataset.partitions or []
+    if version is not None:
+        partitions = partitions[:max(0, version - 1)]
+    return [ensure_columnar_copy(dataset)] + [Path(path) for path in partitions]
+
+
+def dataset_cache_tag(dataset) -> Optional[str]:
+    """Identity of a dataset's rows for result caches.
+
+    The first version is identified by the upload's content hash, shared by
+    identical uploads; appended versions are specific to their dataset.
+    """
+    if not dataset.content_hash:
+        return None
+    if (dataset.version or 1) == 1:
+        return dataset.content_hash
+    return f"{dataset.content_hash}-{dataset.id}-v{dataset.version}"
+
+
+def read_columnar_schema(columnar_path) -> pa.Schema:
+    """Read the schema of a columnar copy without loading any data"""
+    with pa.memory_map(str(_as_parts(columnar_path)[0]), "r") as source:
+        return pa.ipc.open_file(source).schema
+
+
+def open_columnar(columnar_path, columns: Optional[List[str]] = None) -> pa.Table:
+    """Memory-map a columnar copy, optionally projecting columns"""
+    tables = []
+    for part in _as_parts(columnar_path):
+        source = pa.memory_map(str(part), "r")
+        table = pa.ipc.open_file(source).read_all()
+        tables.append(table.select(columns) if columns is not None else table)
+    # Concatenating only chains the mapped chunks together
+    return tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+
+
+def iter_columnar_batches(columnar_path) -> Iterator[pa.RecordBatch]:
+    """Iterate over the record batches of a columnar copy"""
+    for part in _as_parts(columnar_path):
+        with pa.memory_map(str(part), "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+
+def read_columnar_frame(
+    columnar_path,
+    columns: Optional[List[str]] = None,
+    dtypes: Optional[Dict[str, str]] = None
+) -> pd.DataFrame:
+    """Load a columnar copy into pandas, materializing only the selected columns.
+
+    With ``dtypes``, columns are cast to their compact dtypes before they
+    are converted, so the full-width copies are never built.
+    """
+    table = open_columnar(columnar_path, columns)
+    if dtypes is None:
+        return table.to_pandas()
+    return to_compact_frame(table, dtypes)
+
+
+def dataset_dtypes(dataset) -> Optional[Dict[str, str]]:
+    """Get the compact dtypes stored with a dataset's schema, if it is loaded with them"""
+    if not settings.DATASET_COMPACT_DTYPES:
+        return None
+    return (dataset.schema or {}).get("compact_dtypes")
+
+
+def load_dataset_frame(dataset, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load a dataset into pandas through its columnar parts"""
+    return read_columnar_frame(dataset_parts(dataset), columns, dataset_dtypes(dataset))
+
+
+def remove_columnar_copy(content_hash: str):
+    """Delete the columnar copy for a content hash"""
+    get_columnar_path(content_hash).unlink(missing_ok=True)
+
+
+def remove_partitions(dataset_id: int):
+    """Delete the partitions appended to a dataset"""
+    shutil.rmtree(PARTITION_DIR / str(dataset_id), ignore_errors=True)
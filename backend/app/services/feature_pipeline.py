@@ -0,0 +1,182 @@
+"""Feature encoding pipelines
+
+The preprocessing step is fitted with the estimator and saved in the same
+sklearn Pipeline, so predictions encode rows exactly as training did.
+Categorical columns are one-hot encoded into sparse matrices while their
+cardinality is low and hashed into a fixed number of buckets beyond that,
+which keeps memory bounded for wide or high-cardinality datasets.
+Streaming training uses ``StreamingEncoder`` instead, which is fitted one
+chunk at a time.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler, TargetEncoder
+
+from app.core.config import settings
+
+ENCODINGS = ("onehot", "hashing", "ordinal", "target")
+MISSING_CATEGORY = "__missing__"
+
+
+def as_category_strings(X: pd.DataFrame) -> pd.DataFrame:
+    """Cast categorical columns to plain strings so mixed-type columns encode cleanly"""
+    return X.astype("string").fillna(MISSING_CATEGORY).astype(object)
+
+
+def as_hashing_tokens(X: pd.DataFrame) -> List[List[str]]:
+    """Turn each row into ``column=value`` tokens for FeatureHasher"""
+    columns = [X[col].map(lambda value, col=col: f"{col}={value}") for col in X.columns]
+    return [list(tokens) for tokens in zip(*columns)]
+
+
+def _category_step():
+    return ("strings", FunctionTransformer(as_category_strings, feature_names_out="one-to-one"))
+
+
+def _encoder(encoding: str, model_type: str):
+    """Build the transformer for one categorical encoding"""
+    if encoding == "onehot":
+        encoder = OneHotEncoder(
+            handle_unknown="infrequent_if_exist",
+            max_categories=settings.FEATURE_ONEHOT_MAX_CATEGORIES,
+            sparse_output=True
+        )
+    elif encoding == "ordinal":
+        encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    elif encoding == "target":
+        encoder = TargetEncoder(target_type="continuous" if model_type == "regression" else "auto")
+    elif encoding == "hashing":
+        return Pipeline([
+            _category_step(),
+            ("tokens", FunctionTransformer(as_hashing_tokens)),
+            ("hash", FeatureHasher(n_features=settings.FEATURE_HASH_BUCKETS, input_type="string"))
+        ])
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    return Pipeline([_category_step(), ("encode", encoder)])
+
+
+def plan_encodings(
+    X: pd.DataFrame,
+    encodings: Optional[Dict[str, str]] = None,
+    default_encoding: Optional[str] = None
+) -> Dict[str, str]:
+    """Choose an encoding for each categorical column, honouring explicit overrides"""
+    encodings = encodings or {}
+    unknown = set(encodings) - set(X.columns)
+    if unknown:
+        raise ValueError(f"Encodings given for unknown columns: {sorted(unknown)}")
+    plan = {}
+    for col in X.columns:
+        if col in encodings:
+            plan[col] = encodings[col]
+        elif pd.api.types.is_numeric_dtype(X[col]) or pd.api.types.is_bool_dtype(X[col]):
+            continue
+        elif default_encoding:
+            plan[col] = default_encoding
+        elif X[col].nunique(dropna=False) <= settings.FEATURE_ONEHOT_MAX_CATEGORIES:
+            plan[col] = "onehot"
+        else:
+            plan[col] = "hashing"
+    return plan
+
+
+def build_preprocessor(
+    X: pd.DataFrame,
+    model_type: str,
+    encodings: Optional[Dict[str, str]] = None,
+    default_encoding: Optional[str] = None,
+    dense: bool = False
+) -> ColumnTransformer:
+    """Build the column-wise preprocessing step for a training frame"""
+    plan = plan_encodings(X, encodings, default_encoding)
+    numeric = [col for col in X.columns if col not in plan]
+    transformers = []
+    if numeric:
+        transformers.append(("numeric", SimpleImputer(strategy="median"), numeric))
+    for encoding in ENCODINGS:
+        columns = [col for col, chosen in plan.items() if chosen == encoding]
+        if columns:
+            transformers.append((encoding, _encoder(encoding, model_type), columns))
+    # Stay sparse whenever encoded categoricals dominate the feature matrix
+    return ColumnTransformer(transformers, sparse_threshold=0 if dense else 0.3)
+
+
+def build_pipeline(
+    estimator,
+    X: pd.DataFrame,
+    model_type: str,
+    encodings: Optional[Dict[str, str]] = None,
+    default_encoding: Optional[str] = None,
+    dense: bool = False
+) -> Pipeline:
+    """Wrap an estimator with its preprocessing step"""
+    return Pipeline([
+        ("preprocess", build_preprocessor(X, model_type, encodings, default_encoding, dense)),
+        ("model", estimator)
+    ])
+
+
+class StreamingEncoder(BaseEstimator, TransformerMixin):
+    """Preprocessing step fitted incrementally with ``partial_fit``.
+
+    Numeric columns are standardized with running moments and missing
+    values land on the mean. Categorical columns are hashed, which needs no
+    fitted state, so every chunk encodes to the same feature layout.
+    """
+
+    def __init__(self, numeric: List[str], categorical: List[str], n_buckets: int = None):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.n_buckets = n_buckets
+
+    def _numeric_values(self, X: pd.DataFrame) -> np.ndarray:
+        return X[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def partial_fit(self, X: pd.DataFrame, y=None):
+        if not hasattr(self, "scaler_"):
+            self.scaler_ = StandardScaler()
+            self.encodings_ = {col: "hashing" for col in self.categorical}
+        if self.numeric:
+            # NaNs are ignored by the running moments
+            self.scaler_.partial_fit(self._numeric_values(X))
+        return self
+
+    def fit(self, X: pd.DataFrame, y=None):
+        for attr in ("scaler_", "encodings_"):
+            self.__dict__.pop(attr, None)
+        return self.partial_fit(X, y)
+
+    def transform(self, X: pd.DataFrame):
+        parts = []
+        if self.numeric:
+            parts.append(np.nan_to_num(self.scaler_.transform(self._numeric_values(X)), nan=0.0))
+        if not self.categorical:
+            return parts[0]
+        hasher = FeatureHasher(n_features=self.n_buckets or settings.FEATURE_HASH_BUCKETS, input_type="string")
+        hashed = hasher.transform(as_hashing_tokens(as_category_strings(X[self.categorical])))
+        return sparse.hstack([sparse.csr_matrix(part) for part in parts] + [hashed], format="csr")
+
+
+def describe_encodings(model) -> Dict[str, str]:
+    """Get the per-column encodings used by a fitted pipeline"""
+    if not isinstance(model, Pipeline) or "preprocess" not in model.named_steps:
+        return {}
+    preprocess = model.named_steps["preprocess"]
+    if isinstance(preprocess, StreamingEncoder):
+        return dict(preprocess.encodings_)
+    return {
+        col: name
+        for name, _, columns in model.named_steps["preprocess"].transformers_
+        if name in ENCODINGS
+        for col in columns
+    }
@@ -3,126 +3,247 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.pipeline import Pipeline
 import joblib
 import os
 from pathlib import Path
+from typing import List, Optional, Union
+
+from app.core.config import settings
+from app.services.algorithms import Algorithm, fitted_iterations, get_algorithm
+from app.services.dataset_loader import format_for_path, read_file_frame
+from app.services.dataset_storage import read_columnar_frame
+from app.services.feature_pipeline import build_pipeline
+from app.services.training_progress import StageRecorder
+
+# joblib compress settings per save profile: "fast" artifacts are plain
+# pickles whose arrays can be memory-mapped, "compressed" suits cold versions
+SAVE_PROFILES = {
+    "fast": 0,
+    "compressed": ("zlib", 3)
+}
+# Uncompressed pickles start with the PROTO opcode; compressed files do not
+PICKLE_MAGIC = b"\x80"
 
 
 class MLService:
     """Service for ML model operations"""
     
-    def __init__(self, model_storage_path: str = "models"):
+    def __init__(self, model_storage_path: str = "models", cache_datasets: bool = False):
         self.model_storage_path = Path(model_storage_path)
         self.model_storage_path.mkdir(parents=True, exist_ok=True)
+        # Worker processes running many trials keep the last loaded frame between them
+        self._datasets = {} if cache_datasets else None
+    
+    def load_dataset(self, dataset_path: Union[str, List[str]], dtypes: Optional[dict] = None) -> pd.DataFrame:
+        """Load training data, memory-mapping columnar copies when available.
+
+        A list of paths holds the columnar parts of a dataset version;
+        ``dtypes`` are the compact dtypes stored with the dataset's schema.
+        """
+        key = tuple(dataset_path) if isinstance(dataset_path, list) else dataset_path
+        if self._datasets is not None and key in self._datasets:
+            return self._datasets[key]
+        if isinstance(dataset_path, list) or Path(dataset_path).suffix == ".arrow":
+            df = read_columnar_frame(dataset_path, dtypes=dtypes)
+        else:
+            df = read_file_frame(dataset_path, format_for_path(dataset_path))
+        if self._datasets is not None:
+            # Only the latest dataset: search workers outlive searches and would keep every one
+            self._datasets.clear()
+            self._datasets[key] = df
+        return df
+    
+    def subsample(self, X: pd.DataFrame, y: pd.Series, fraction: float, random_state: int):
+        """Take a deterministic fraction of the training rows"""
+        if fraction >= 1.0:
+            return X, y
+        X = X.sample(frac=fraction, random_state=random_state)
+        return X, y.loc[X.index]
+    
+    def fit_model(
+        self,
+        algorithm: Algorithm,
+        X: pd.DataFrame,
+        y: pd.Series,
+        model_type: str,
+        hyperparameters: dict,
+        encodings: dict,
+        random_state: int,
+        recorder: Optional[StageRecorder] = None
+    ) -> Pipeline:
+        """Fit an algorithm with its preprocessing, stopping early on a validation split when it supports it"""
+        recorder = recorder or StageRecorder()
+        estimator = algorithm.build(model_type, hyperparameters, random_state)
+        # Encode categoricals inside the model pipeline so predictions reuse the fitted encoders
+        model = build_pipeline(estimator, X, model_type, encodings, algorithm.categorical_encoding, algorithm.dense)
+        preprocess = model.named_steps["preprocess"]
+        if algorithm.uses_eval_set:
+            X, X_val, y, y_val = train_test_split(
+                X, y,
+                test_size=hyperparameters.get("validation_fraction", 0.1),
+                random_state=random_state,
+                stratify=y if model_type == "classification" else None
+            )
+        
+        # The pipeline's steps are fitted one at a time so encoding and fitting are timed apart
+        with recorder.stage("encode", rows=len(X)):
+            features = preprocess.fit_transform(X, y)
+            # The validation rows go through the preprocessing fitted on the rest
+            fit_params = (
+                algorithm.eval_fit_params(preprocess.transform(X_val), y_val, hyperparameters)
+                if algorithm.uses_eval_set else {}
+            )
+        with recorder.stage("fit", rows=len(X)):
+            estimator.fit(features, y, **fit_params)
+        return model
     
     def train_classification_model(
         self,
-        dataset_path: str,
+        dataset_path: Union[str, List[str]],
         target_column: str,
         algorithm: str = "random_forest",
         test_size: float = 0.2,
         random_state: int = 42,
-        hyperparameters: dict = None
+        hyperparameters: dict = None,
+        encodings: dict = None,
+        dtypes: dict = None,
+        train_fraction: float = 1.0,
+        recorder: Optional[StageRecorder] = None
     ):
         """Train a classification model"""
+        hyperparameters = hyperparameters or {}
+        recorder = recorder or StageRecorder()
         # Load data
-        df = pd.read_csv(dataset_path)
+        with recorder.stage("load") as stage:
+            df = self.load_dataset(dataset_path, dtypes)
+            stage["rows"] = len(df)
         
         # Prepare features and target
         X = df.drop(columns=[target_column])
         y = df[target_column]
         
-        # Handle categorical variables
-        X = pd.get_dummies(X)
-        
         # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state, stratify=y
-        )
-        
-        # Train model
-        if algorithm == "random_forest":
-            model = RandomForestClassifier(
-                n_estimators=hyperparameters.get("n_estimators", 100),
-                max_depth=hyperparameters.get("max_depth", None),
-                random_state=random_state
+        with recorder.stage("split", rows=len(df)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=test_size, random_state=random_state, stratify=y
             )
-        else:
-            raise ValueError(f"Unsupported algorithm: {algorithm}")
+            X_train, y_train = self.subsample(X_train, y_train, train_fraction, random_state)
         
-        model.fit(X_train, y_train)
+        # Train model
+        model = self.fit_model(
+            get_algorithm(algorithm, "classification"), X_train, y_train,
+            "classification", hyperparameters, encodings, random_state, recorder
+        )
         
         # Evaluate
-        y_pred = model.predict(X_test)
+        with recorder.stage("evaluate", rows=len(X_test)):
+            y_pred = model.predict(X_test)
         metrics = {
             "accuracy": float(accuracy_score(y_test, y_pred)),
             "precision": float(precision_score(y_test, y_pred, average="weighted")),
             "recall": float(recall_score(y_test, y_pred, average="weighted")),
             "f1_score": float(f1_score(y_test, y_pred, average="weighted"))
         }
+        self.add_iterations(metrics, model)
         
         return model, metrics
     
     def train_regression_model(
         self,
-        dataset_path: str,
+        dataset_path: Union[str, List[str]],
         target_column: str,
         algorithm: str = "random_forest",
         test_size: float = 0.2,
         random_state: int = 42,
-        hyperparameters: dict = None
+        hyperparameters: dict = None,
+        encodings: dict = None,
+        dtypes: dict = None,
+        train_fraction: float = 1.0,
+        recorder: Optional[StageRecorder] = None
     ):
         """Train a regression model"""
+        hyperparameters = hyperparameters or {}
+        recorder = recorder or StageRecorder()
         # Load data
-        df = pd.read_csv(dataset_path)
+        with recorder.stage("load") as stage:
+            df = self.load_dataset(dataset_path, dtypes)
+            stage["rows"] = len(df)
         
         # Prepare features and target
         X = df.drop(columns=[target_column])
         y = df[target_column]
         
-        # Handle categorical variables
-        X = pd.get_dummies(X)
-        
         # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state
-        )
-        
-        # Train model
-        if algorithm == "random_forest":
-            model = RandomForestRegressor(
-                n_estimators=hyperparameters.get("n_estimators", 100),
-                max_depth=hyperparameters.get("max_depth", None),
-                random_state=random_state
+        with recorder.stage("split", rows=len(df)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=test_size, random_state=random_state
             )
-        else:
-            raise ValueError(f"Unsupported algorithm: {algorithm}")
+            X_train, y_train = self.subsample(X_train, y_train, train_fraction, random_state)
         
-        model.fit(X_train, y_train)
+        # Train model
+        model = self.fit_model(
+            get_algorithm(algorithm, "regression"), X_train, y_train,
+            "regression", hyperparameters, encodings, random_state, recorder
+        )
         
         # Evaluate
-        y_pred = model.predict(X_test)
+        with recorder.stage("evaluate", rows=len(X_test)):
+            y_pred = model.predict(X_test)
         metrics = {
             "mse": float(mean_squared_error(y_test, y_pred)),
             "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
             "r2_score": float(r2_score(y_test, y_pred))
         }
+        self.add_iterations(metrics, model)
         
         return model, metrics
     
-    def save_model(self, model, model_id: int, version: str):
-        """Save a trained model"""
+    def add_iterations(self, metrics: dict, model: Pipeline):
+        """Record how many rounds or epochs an early-stopped model trained for"""
+        iterations = fitted_iterations(model.named_steps["model"])
+        if iterations is not None:
+            metrics["iterations"] = iterations
+    
+    def save_model(self, model, model_id: int, version: str, profile: str = None):
+        """Save a trained model with the given save profile"""
         model_path = self.model_storage_path / f"model_{model_id}_v{version}.pkl"
-        joblib.dump(model, model_path)
+        self.dump_model(model, model_path, profile)
         return str(model_path)
     
+    def dump_model(self, model, model_path, profile: str = None):
+        """Write a model artifact using a save profile"""
+        profile = profile or settings.MODEL_SAVE_PROFILE
+        if profile not in SAVE_PROFILES:
+            raise ValueError(f"Unsupported save profile: {profile}")
+        joblib.dump(model, model_path, compress=SAVE_PROFILES[profile])
+    
+    def is_memory_mappable(self, model_path: str) -> bool:
+        """Check whether an artifact is an uncompressed pickle that can be memory-mapped"""
+        with open(model_path, "rb") as f:
+            return f.read(1) == PICKLE_MAGIC
+    
     def load_model(self, model_path: str):
-        """Load a saved model"""
+        """Load a saved model, memory-mapping its numpy arrays when uncompressed"""
+        if settings.MODEL_MMAP and self.is_memory_mappable(model_path):
+            # Arrays stay backed by the file, so workers share one page-cache copy
+            return joblib.load(model_path, mmap_mode="r")
         return joblib.load(model_path)
     
+    def prepare_features(self, model, data: pd.DataFrame) -> pd.DataFrame:
+        """Encode raw rows into the feature layout the model was trained on"""
+        if isinstance(model, Pipeline):
+            # The saved pipeline carries its own fitted encoders
+            return data
+        # Models saved before encoding pipelines were trained on pd.get_dummies output
+        X = pd.get_dummies(data)
+        feature_names = getattr(model, "feature_names_in_", None)
+        if feature_names is not None:
+            X = X.reindex(columns=feature_names, fill_value=0)
+        return X
+    
     def predict(self, model, data):
         """Make predictions with a model"""
         return model.predict(data)
@@ -0,0 +1,121 @@
+"""Process-wide cache of loaded models"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from app.core.config import settings
+from app.core.metrics import current_rss_bytes
+from app.services.ml_service import MLService
+
+
+class ModelCache:
+    """LRU cache of loaded models keyed by ModelVersion.id and bounded by size.
+
+    Model size is estimated from the artifact file, which tracks the size of
+    the numpy arrays that dominate a fitted estimator's memory.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.MODEL_CACHE_MAX_BYTES
+        self.service = MLService(settings.MODEL_STORAGE_DIR)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._loading: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, version_id: int, model_path: str):
+        """Get a loaded model, loading it from disk on a miss"""
+        with self._lock:
+            entry = self._entries.get(version_id)
+            if entry is not None:
+                self._entries.move_to_end(version_id)
+                self.hits += 1
+                return entry[0]
+            loading = self._loading.setdefault(version_id, threading.Lock())
+
+        # One loader per version; concurrent requests for it wait instead of loading again
+        with loading:
+            with self._lock:
+                entry = self._entries.get(version_id)
+                if entry is not None:
+                    self._entries.move_to_end(version_id)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            try:
+                start = time.perf_counter()
+                model = self.service.load_model(model_path)
+                self._put(version_id, model, os.path.getsize(model_path), {
+                    "load_seconds": time.perf_counter() - start,
+                    "memory_mapped": settings.MODEL_MMAP and self.service.is_memory_mappable(model_path)
+                })
+            finally:
+                with self._lock:
+                    self._loading.pop(version_id, None)
+            return model
+
+    def _put(self, version_id: int, model, size: int, info: dict):
+        with self._lock:
+            self._entries[version_id] = (model, size, info)
+            self.current_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, version_id: int):
+        """Drop a model from the cache"""
+        with self._lock:
+            entry = self._entries.pop(version_id, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+
+    def stats(self) -> dict:
+        """Get cache usage counters, cold-load times and this worker's resident memory"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "rss_bytes": current_rss_bytes(),
+                "entries": [
+                    {"version_id": version_id, "size_bytes": size, **info}
+                    for version_id, (_, size, info) in self._entries.items()
+                ],
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+model_cache = ModelCache()
+
+
+def warm_model_cache():
+    """Load the latest version of every deployed model into the cache"""
+    from app.core.database import SessionLocal
+    from app.models.model import MLModel, ModelVersion
+
+    db = SessionLocal()
+    try:
+        versions = db.query(ModelVersion).join(MLModel).filter(
+            MLModel.status == "deployed"
+        ).order_by(ModelVersion.model_id, ModelVersion.id.desc()).all()
+        latest = {}
+        for version in versions:
+            latest.setdefault(version.model_id, version)
+        for version in latest.values():
+            try:
+                model_cache.get(version.id, version.model_path)
+            except Exception as e:
+                print(f"Could not warm model version {version.id}: {e}")
+        print(f"Model cache warmed with {len(latest)} deployed model(s)")
+    finally:
+        db.close()
@@ -0,0 +1,476 @@
+"""Single-pass streaming dataset profiler
+
+Profiles are built one Arrow record batch at a time so memory stays bounded
+regardless of file size. Every statistic is mergeable: moments use Chan's
+parallel form of Welford's algorithm, distinct counts use HyperLogLog and
+quantiles use a KLL sketch. Sketch state is serialized so a stored profile
+can later be extended without rescanning the data. The same statistics pick
+the compact dtypes frames are loaded with.
+"""
+
+import base64
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import settings
+from app.services.dataset_loader import compact_pandas_dtypes
+from app.services.dataset_storage import dataset_parts, iter_columnar_batches, read_columnar_schema
+from app.services.upload_service import hash_file
+
+HLL_PRECISION = 11
+KLL_K = 128
+PROFILE_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Signed only, so arithmetic on loaded columns cannot wrap below zero
+COMPACT_INTEGER_TYPES = (("int8", 8), ("int16", 16), ("int32", 32))
+# Integers up to 2**24 are exact in float32
+FLOAT32_EXACT_INTEGER = 1 << 24
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch over 64-bit hashes"""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        """Add an array of uint64 hashes"""
+        if len(hashes) == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        remaining_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remaining_bits)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+        # frexp gives the exact bit length since remainder fits in a float64 mantissa
+        _, bit_length = np.frexp(remainder.astype(np.float64))
+        rank = (remaining_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        """Merge another sketch into this one"""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        """Estimate the number of distinct values"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(state["registers"]), dtype=np.uint8).copy()
+        return cls(state["precision"], registers)
+
+
+class KLLSketch:
+    """KLL quantile sketch with geometrically shrinking compactor capacities"""
+
+    def __init__(self, k: int = KLL_K, levels: Optional[List[np.ndarray]] = None):
+        self.k = k
+        self.levels = levels if levels is not None else [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                # Keep an odd leftover at this level so only pairs are compacted
+                keep = items[:1] if len(items) % 2 else items[:0]
+                pairs = items[len(keep):]
+                promoted = pairs[self._rng.integers(0, 2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray):
+        """Add an array of numeric values"""
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64, copy=False)])
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        """Merge another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[str, Optional[float]]:
+        """Estimate quantiles for the given ranks"""
+        qs = list(qs)
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return {str(q): None for q in qs}
+        weights = np.concatenate([
+            np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+        cumulative /= cumulative[-1]
+        return {
+            str(q): float(values[min(np.searchsorted(cumulative, q), len(values) - 1)])
+            for q in qs
+        }
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "levels": [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "KLLSketch":
+        return cls(state["k"], [np.asarray(items, dtype=np.float64) for items in state["levels"]])
+
+
+def _is_numeric(data_type: pa.DataType) -> bool:
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+
+class ColumnProfile:
+    """Mergeable statistics for a single column"""
+
+    def __init__(self, data_type: pa.DataType):
+        self.data_type = data_type
+        self.numeric = _is_numeric(data_type)
+        self.count = 0
+        self.null_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+        self.quantiles = KLLSketch() if self.numeric else None
+        # Whether every value seen survives a round trip through float32
+        self.float32_exact = True
+
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        # Chan et al. parallel combination of Welford accumulators
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def _merge_bounds(self, low, high):
+        if low is None:
+            return
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def update(self, column: pa.Array):
+        """Add one batch of values"""
+        self.null_count += column.null_count
+        values = column.drop_null().to_numpy(zero_copy_only=False)
+        if len(values) == 0:
+            return
+        if pa.types.is_nested(self.data_type):
+            values = values.astype(str)
+        self.distinct.add_hashes(pd.util.hash_array(values))
+        if self.numeric:
+            values = values.astype(np.float64, copy=False)
+            values = values[np.isfinite(values)]
+            if len(values):
+                self._merge_moments(len(values), float(values.mean()), float(((values - values.mean()) ** 2).sum()))
+                self._merge_bounds(float(values.min()), float(values.max()))
+                self.quantiles.update(values)
+                if self.float32_exact and pa.types.is_float64(self.data_type):
+                    self.float32_exact = bool(np.array_equal(values.astype(np.float32).astype(np.float64), values))
+        else:
+            self.count += len(values)
+            if pa.types.is_temporal(self.data_type):
+                self._merge_bounds(str(values.min()), str(values.max()))
+
+    def merge(self, other: "ColumnProfile"):
+        """Merge another profile of the same column into this one"""
+        self.null_count += other.null_count
+        if self.numeric:
+            if other.count:
+                self._merge_moments(other.count, other.mean, other.m2)
+            self.quantiles.merge(other.quantiles)
+            self.float32_exact = self.float32_exact and other.float32_exact
+        else:
+            self.count += other.count
+        self._merge_bounds(other.min, other.max)
+        self.distinct.merge(other.distinct)
+
+    def summary(self) -> dict:
+        """Get the finalized statistics of this column"""
+        stats = {
+            "dtype": str(self.data_type),
+            "count": self.count,
+            "null_count": self.null_count,
+            "distinct_count": self.distinct.estimate(),
+            "min": self.min,
+            "max": self.max
+        }
+        if self.numeric:
+            stats["mean"] = self.mean if self.count else None
+            stats["variance"] = self.m2 / (self.count - 1) if self.count > 1 else None
+            stats["std"] = math.sqrt(stats["variance"]) if stats["variance"] is not None else None
+            stats["quantiles"] = self.quantiles.quantiles(PROFILE_QUANTILES)
+        return stats
+
+    def compact_dtype(self) -> Optional[str]:
+        """Smallest dtype that holds this column's values, or None to keep the loaded one"""
+        data_type = self.data_type
+        if pa.types.is_integer(data_type) and self.min is not None:
+            if self.null_count:
+                # pandas loads integers with nulls as float64
+                exact = -FLOAT32_EXACT_INTEGER <= self.min and self.max <= FLOAT32_EXACT_INTEGER
+                return "float32" if settings.DATASET_DOWNCAST_FLOATS and exact else None
+            for name, bits in COMPACT_INTEGER_TYPES:
+                if bits >= data_type.bit_width:
+                    return None
+                if -(1 << (bits - 1)) <= self.min and self.max < (1 << (bits - 1)):
+                    return name
+        elif pa.types.is_float64(data_type) and settings.DATASET_DOWNCAST_FLOATS and self.float32_exact:
+            # Only columns whose values float32 holds exactly, such as small integers and halves
+            return "float32"
+        elif (pa.types.is_string(data_type) or pa.types.is_large_string(data_type)) and self.count:
+            if self.distinct.estimate() <= self.count * settings.DATASET_CATEGORY_MAX_RATIO:
+                return "category"
+            return "string"
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+            "distinct": self.distinct.to_dict(),
+            "quantiles": self.quantiles.to_dict() if self.quantiles is not None else None,
+            "float32_exact": self.float32_exact
+        }
+
+    @classmethod
+    def from_dict(cls, data_type: pa.DataType, state: dict) -> "ColumnProfile":
+        profile = cls(data_type)
+        profile.count = state["count"]
+        profile.null_count = state["null_count"]
+        profile.mean = state["mean"]
+        profile.m2 = state["m2"]
+        profile.min = state["min"]
+        profile.max = state["max"]
+        profile.distinct = HyperLogLog.from_dict(state["distinct"])
+        # Unknown for sketches stored before it was tracked
+        profile.float32_exact = state.get("float32_exact", False)
+        if state["quantiles"] is not None:
+            profile.quantiles = KLLSketch.from_dict(state["quantiles"])
+        return profile
+
+
+class DatasetProfiler:
+    """Streaming profiler over Arrow record batches"""
+
+    def __init__(self, schema: pa.Schema):
+        self.schema = schema
+        self.row_count = 0
+        self.nbytes = 0
+        self.columns = {field.name: ColumnProfile(field.type) for field in schema}
+
+    def update(self, batch: pa.RecordBatch):
+        """Profile one record batch"""
+        self.row_count += batch.num_rows
+        self.nbytes += batch.nbytes
+        for name, column in zip(batch.schema.names, batch.columns):
+            self.columns[name].update(column)
+
+    def merge(self, other: "DatasetProfiler"):
+        """Merge the profile of more rows with the same columns"""
+        self.row_count += other.row_count
+        self.nbytes += other.nbytes
+        for name, profile in other.columns.items():
+            self.columns[name].merge(profile)
+
+    def compact_dtypes(self) -> Dict[str, str]:
+        """Compact dtypes of the columns that have one"""
+        dtypes = {name: profile.compact_dtype() for name, profile in self.columns.items()}
+        return {name: dtype for name, dtype in dtypes.items() if dtype is not None}
+
+    def to_schema(self) -> dict:
+        """Build the ``Dataset.schema`` description"""
+        schema = {
+            "columns": list(self.schema.names),
+            "shape": [self.row_count, len(self.schema.names)]
+        }
+        # Report pandas dtypes, matching what a materialized frame will have
+        if settings.DATASET_COMPACT_DTYPES:
+            schema["compact_dtypes"] = self.compact_dtypes()
+            schema["dtypes"] = compact_pandas_dtypes(self.schema, schema["compact_dtypes"])
+        else:
+            dtypes = self.schema.empty_table().to_pandas().dtypes
+            schema["dtypes"] = {col: str(dtype) for col, dtype in dtypes.items()}
+        return schema
+
+    def to_profile(self) -> dict:
+        """Get the finalized per-column statistics"""
+        return {
+            "row_count": self.row_count,
+            "columns": {name: profile.summary() for name, profile in self.columns.items()}
+        }
+
+    def to_summary(self) -> dict:
+        """Build the statistical summary served by the visualization endpoints"""
+        schema = self.to_schema()
+        numeric_summary = {}
+        for name, profile in self.columns.items():
+            if not profile.numeric:
+                continue
+            stats = profile.summary()
+            quantiles = stats["quantiles"]
+            numeric_summary[name] = {
+                "count": stats["count"],
+                "mean": stats["mean"],
+                "std": stats["std"],
+                "min": stats["min"],
+                "25%": quantiles["0.25"],
+                "50%": quantiles["0.5"],
+                "75%": quantiles["0.75"],
+                "max": stats["max"]
+            }
+        return {
+            "shape": schema["shape"],
+            "columns": schema["columns"],
+            "dtypes": schema["dtypes"],
+            "numeric_summary": numeric_summary,
+            "missing_values": {name: profile.null_count for name, profile in self.columns.items()},
+            # Arrow buffer size, a lower bound on the pandas deep memory usage
+            "memory_usage": self.nbytes
+        }
+
+    def to_state(self) -> dict:
+        """Serialize the mergeable sketch state"""
+        return {
+            "row_count": self.row_count,
+            "nbytes": self.nbytes,
+            "columns": {name: profile.to_dict() for name, profile in self.columns.items()}
+        }
+
+    @classmethod
+    def from_state(cls, schema: pa.Schema, state: dict) -> "DatasetProfiler":
+        profiler = cls(schema)
+        profiler.row_count = state["row_count"]
+        profiler.nbytes = state.get("nbytes", 0)
+        profiler.columns = {
+            field.name: ColumnProfile.from_dict(field.type, state["columns"][field.name])
+            for field in schema
+        }
+        return profiler
+
+
+def profile_columnar(columnar_path) -> DatasetProfiler:
+    """Profile a columnar copy, or a list of parts, in one pass over its record batches"""
+    profiler = DatasetProfiler(read_columnar_schema(columnar_path))
+    for batch in iter_columnar_batches(columnar_path):
+        profiler.update(batch)
+    return profiler
+
+
+def file_fingerprint(file_path) -> dict:
+    """Cheap identity of a file's current contents, used to invalidate stored profiles"""
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_profile_metadata(profiler: DatasetProfiler, file_path) -> dict:
+    """Build the ``Dataset.extra_metadata`` entries stored for a profile; its sketches go to ``Dataset.sketches``"""
+    return {
+        "profile": profiler.to_profile(),
+        "summary": profiler.to_summary(),
+        "fingerprint": file_fingerprint(file_path)
+    }
+
+
+def refresh_dataset_profile(dataset):
+    """Re-profile a dataset and store the results on its row; the caller commits"""
+    metadata = dataset.extra_metadata or {}
+    if metadata.get("fingerprint") not in (None, file_fingerprint(dataset.file_path)):
+        # The raw file changed since it was profiled, so its columnar copy is stale too
+        dataset.content_hash = hash_file(dataset.file_path)
+        dataset.columnar_path = None
+    _store_profile(dataset, profile_columnar(dataset_parts(dataset)))
+
+
+def extend_dataset_profile(dataset, partition_path, sketches: Optional[dict]) -> int:
+    """Fold an appended partition into a dataset's stored profile, scanning only the new rows.
+
+    ``sketches`` is the dataset's stored ``Dataset.sketches``, which the
+    caller loads since the column is deferred. Returns the number of rows
+    added; the caller commits.
+    """
+    added = profile_columnar(partition_path)
+    # Profiles stored before the sketches had their own column kept them in extra_metadata
+    state = sketches if sketches is not None else (dataset.extra_metadata or {}).get("sketches")
+    if state is None:
+        # Profiled before sketches were stored; rescan the existing parts once
+        profiler = profile_columnar(dataset_parts(dataset))
+    else:
+        profiler = DatasetProfiler.from_state(read_columnar_schema(partition_path), state)
+    profiler.merge(added)
+    _store_profile(dataset, profiler)
+    return added.row_count
+
+
+def _store_profile(dataset, profiler: DatasetProfiler):
+    dataset.row_count = profiler.row_count
+    dataset.column_count = len(profiler.columns)
+    dataset.schema = profiler.to_schema()
+    dataset.sketches = profiler.to_state()
+    # Reassign rather than mutate so SQLAlchemy detects the JSON change
+    metadata = {key: value for key, value in (dataset.extra_metadata or {}).items() if key != "sketches"}
+    dataset.extra_metadata = {**metadata, **build_profile_metadata(profiler, dataset.file_path)}
+
+
+def load_dataset_summary(dataset) -> dict:
+    """Get a dataset's stored summary, computing it on first use or after the file changed"""
+    metadata = dataset.extra_metadata or {}
+    if "summary" not in metadata or metadata.get("fingerprint") != file_fingerprint(dataset.file_path):
+        refresh_dataset_profile(dataset)
+    return dataset.extra_metadata["summary"]
+
+
+SUMMARY_STATS = ("count", "mean", "std", "min", "25%", "50%", "75%", "max")
+
+
+def summary_to_table(summary: dict) -> pa.Table:
+    """Lay a summary out as one row per column, for Arrow responses"""
+    numeric = summary["numeric_summary"]
+    columns = summary["columns"]
+    table = {
+        "column": columns,
+        "dtype": [summary["dtypes"][col] for col in columns],
+        "missing": pa.array([summary["missing_values"].get(col, 0) for col in columns], pa.int64())
+    }
+    for stat in SUMMARY_STATS:
+        table[stat] = pa.array(
+            [numeric[col][stat] if col in numeric else None for col in columns],
+            pa.int64() if stat == "count" else pa.float64()
+        )
+    return pa.table(table)
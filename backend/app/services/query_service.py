@@ -0,0 +1,229 @@
+"""Lazy queries over columnar dataset copies
+
+Queries run against the memory-mapped Arrow IPC copy through
+pyarrow.dataset. Column projections and filters are pushed into the scan,
+so only the selected columns of matching batches are paged in. Row pages
+and heads stop scanning once they have enough rows, samples stream through
+a fixed-size reservoir and tails read record batches backwards from the end
+of the file. A dataset with appended partitions is queried as one
+dataset over all of its parts.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from app.core.config import settings
+
+QUERY_MODES = ("rows", "head", "tail", "sample")
+FILTER_OPS = ("==", "!=", "<", "<=", ">", ">=", "in", "not_in", "is_null", "not_null")
+AGGREGATE_FUNCS = ("count", "count_distinct", "sum", "mean", "min", "max", "stddev", "variance")
+
+_local_fs = fs.LocalFileSystem(use_mmap=True)
+
+
+def _part_paths(columnar_path) -> List[str]:
+    if isinstance(columnar_path, (list, tuple)):
+        return [str(part) for part in columnar_path]
+    return [str(columnar_path)]
+
+
+def open_dataset(columnar_path) -> ds.Dataset:
+    """Open a columnar copy, or a list of parts, as a memory-mapped pyarrow dataset"""
+    return ds.dataset(_part_paths(columnar_path), format="ipc", filesystem=_local_fs)
+
+
+def _check_columns(schema: pa.Schema, columns: List[str]):
+    missing = [col for col in columns if schema.get_field_index(col) == -1]
+    if missing:
+        raise ValueError(f"Unknown columns: {missing}")
+
+
+def _literal(data_type: pa.DataType, value: Any, column: str):
+    """Cast a filter value to its column's type so comparisons bind cleanly"""
+    try:
+        if isinstance(value, list):
+            return pa.array(value).cast(data_type)
+        return pa.scalar(value).cast(data_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        raise ValueError(f"Cannot compare column {column} with {value!r}")
+
+
+def build_filter(schema: pa.Schema, filters: List[dict]) -> Optional[ds.Expression]:
+    """Combine filter specs into one pushed-down expression"""
+    expression = None
+    for spec in filters:
+        column, op, value = spec["column"], spec["op"], spec.get("value")
+        _check_columns(schema, [column])
+        field = pc.field(column)
+        data_type = schema.field(column).type
+        if op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise ValueError(f"Filter {op} on {column} needs a list of values")
+            condition = field.isin(_literal(data_type, value, column))
+            if op == "not_in":
+                condition = ~condition
+        elif op == "is_null":
+            condition = field.is_null()
+        elif op == "not_null":
+            condition = field.is_valid()
+        elif op in FILTER_OPS:
+            literal = _literal(data_type, value, column)
+            condition = {
+                "==": field == literal,
+                "!=": field != literal,
+                "<": field < literal,
+                "<=": field <= literal,
+                ">": field > literal,
+                ">=": field >= literal
+            }[op]
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def page_rows(
+    dataset: ds.Dataset,
+    columns: List[str],
+    expression: Optional[ds.Expression],
+    offset: int,
+    limit: int
+) -> Tuple[pa.Table, Optional[int]]:
+    """Get one page of matching rows, scanning only up to the end of the page"""
+    schema = pa.schema([dataset.schema.field(col) for col in columns])
+    batches = []
+    taken = 0
+    to_skip = offset
+    for batch in dataset.scanner(columns=columns, filter=expression).to_batches():
+        if to_skip >= batch.num_rows:
+            to_skip -= batch.num_rows
+            continue
+        # One row past the page tells whether another page follows
+        batch = batch.slice(to_skip, limit + 1 - taken)
+        to_skip = 0
+        batches.append(batch)
+        taken += batch.num_rows
+        if taken > limit:
+            break
+    table = pa.Table.from_batches(batches, schema=schema)
+    next_offset = offset + limit if table.num_rows > limit else None
+    return table.slice(0, limit), next_offset
+
+
+def tail_rows(columnar_path, columns: List[str], expression: Optional[ds.Expression], limit: int) -> pa.Table:
+    """Get the last matching rows, reading record batches backwards from the end of the last part"""
+    parts = []
+    taken = 0
+    schema = None
+    for path in reversed(_part_paths(columnar_path)):
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        schema = schema or pa.schema([reader.schema.field(col) for col in columns])
+        for i in reversed(range(reader.num_record_batches)):
+            table = pa.Table.from_batches([reader.get_batch(i)])
+            if expression is not None:
+                table = table.filter(expression)
+            table = table.select(columns)
+            part = table.slice(max(0, table.num_rows - (limit - taken)))
+            parts.append(part)
+            taken += part.num_rows
+            if taken >= limit:
+                break
+        if taken >= limit:
+            break
+    return pa.concat_tables(list(reversed(parts))) if parts else schema.empty_table()
+
+
+def reservoir_sample(
+    dataset: ds.Dataset,
+    columns: List[str],
+    expression: Optional[ds.Expression],
+    size: int,
+    seed: Optional[int] = None
+) -> pa.Table:
+    """Uniform sample of matching rows in one streaming pass.
+
+    Every row gets a random key and the reservoir keeps the ``size``
+    smallest keys seen so far, which is a uniform sample without replacement.
+    """
+    rng = np.random.default_rng(seed)
+    sample = pa.schema([dataset.schema.field(col) for col in columns]).empty_table()
+    keys = np.empty(0)
+    for batch in dataset.scanner(columns=columns, filter=expression).to_batches():
+        if batch.num_rows == 0:
+            continue
+        batch_keys = rng.random(batch.num_rows)
+        if len(keys) >= size:
+            # Only rows beating the largest kept key can enter a full reservoir
+            candidates = np.flatnonzero(batch_keys < keys.max())
+            if len(candidates) == 0:
+                continue
+            batch = batch.take(pa.array(candidates))
+            batch_keys = batch_keys[candidates]
+        sample = pa.concat_tables([sample, pa.Table.from_batches([batch])])
+        keys = np.concatenate([keys, batch_keys])
+        if len(keys) > size:
+            keep = np.sort(np.argpartition(keys, size - 1)[:size])
+            sample = sample.take(pa.array(keep))
+            keys = keys[keep]
+    return sample
+
+
+def aggregate(
+    dataset: ds.Dataset,
+    expression: Optional[ds.Expression],
+    group_by: List[str],
+    aggregates: List[dict]
+) -> pa.Table:
+    """Aggregate matching rows, reading only the grouped and aggregated columns"""
+    for spec in aggregates:
+        if spec["func"] not in AGGREGATE_FUNCS:
+            raise ValueError(f"Unsupported aggregate: {spec['func']}")
+    _check_columns(dataset.schema, group_by + [spec["column"] for spec in aggregates])
+    needed = list(dict.fromkeys(group_by + [spec["column"] for spec in aggregates]))
+    table = dataset.to_table(columns=needed, filter=expression)
+    names = [f"{spec['column']}_{spec['func']}" for spec in aggregates]
+
+    if not group_by:
+        return pa.table({
+            name: [getattr(pc, spec["func"])(table[spec["column"]]).as_py()]
+            for name, spec in zip(names, aggregates)
+        })
+
+    result = table.group_by(group_by).aggregate([(spec["column"], spec["func"]) for spec in aggregates])
+    return result.select(group_by + names).sort_by([(col, "ascending") for col in group_by])
+
+
+def run_query(columnar_path, spec: Dict[str, Any]) -> Tuple[pa.Table, Optional[int]]:
+    """Run a query spec against a columnar copy or its parts; returns the result and the next page's offset"""
+    dataset = open_dataset(columnar_path)
+    expression = build_filter(dataset.schema, spec.get("filters") or [])
+    limit = min(spec.get("limit") or 100, settings.QUERY_MAX_ROWS)
+    offset = spec.get("offset") or 0
+    mode = spec.get("mode") or "rows"
+    if mode not in QUERY_MODES:
+        raise ValueError(f"Unsupported query mode: {mode}")
+
+    group_by = spec.get("group_by") or []
+    aggregates = spec.get("aggregates") or []
+    if group_by or aggregates:
+        if not aggregates:
+            raise ValueError("group_by needs at least one aggregate")
+        table = aggregate(dataset, expression, group_by, aggregates)
+        next_offset = offset + limit if table.num_rows > offset + limit else None
+        return table.slice(offset, limit), next_offset
+
+    columns = spec.get("columns") or dataset.schema.names
+    _check_columns(dataset.schema, columns)
+    if mode == "head":
+        return dataset.head(limit, columns=columns, filter=expression), None
+    elif mode == "tail":
+        return tail_rows(columnar_path, columns, expression, limit), None
+    elif mode == "sample":
+        return reservoir_sample(dataset, columns, expression, limit, spec.get("seed")), None
+    return page_rows(dataset, columns, expression, offset, limit)
+
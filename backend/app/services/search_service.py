@@ -0,0 +1,310 @@
+"""Parallel hyperparameter search
+
+Trials of every search run on one process pool of ``SEARCH_POOL_WORKERS``
+workers, so concurrent searches queue for the same processes instead of
+each starting its own; a search keeps at most ``max_parallel`` of its
+trials in flight. Every worker keeps the memory-mapped dataset loaded
+between its trials, so the file is read once per worker rather than once
+per trial. Successive halving trains all
+candidates on a small fraction of the rows first and only keeps the best
+``1 / halving_factor`` of them for each larger rung, stopping bad trials
+early. Each trial is recorded as its own ModelExperiment and the best one
+is promoted to a ModelVersion through the training executor.
+"""
+
+import math
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+from threadpoolctl import threadpool_limits
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.model import MLModel, ModelExperiment, ModelVersion
+from app.services.ml_service import MLService
+from app.services.training_service import training_executor, next_model_version
+
+STRATEGIES = ("grid", "random", "halving")
+# Metrics where lower values are better; all others are maximized
+LOWER_IS_BETTER = ("mse", "rmse")
+# Smallest share of the training rows a halving rung may use
+MIN_TRAIN_FRACTION = 0.01
+# Searches kept in memory for status queries
+SEARCH_HISTORY = 100
+
+_worker_service: Optional[MLService] = None
+_trial_pool = None
+_trial_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    global _worker_service
+    _worker_service = MLService(settings.MODEL_STORAGE_DIR, cache_datasets=True)
+
+
+def run_trial(params: dict) -> dict:
+    """Train and evaluate one candidate; runs inside a search worker"""
+    service = _worker_service or MLService(settings.MODEL_STORAGE_DIR, cache_datasets=True)
+    if params["model_type"] == "classification":
+        train = service.train_classification_model
+    elif params["model_type"] == "regression":
+        train = service.train_regression_model
+    else:
+        raise ValueError(f"Unsupported model type: {params['model_type']}")
+
+    with threadpool_limits(limits=params["n_jobs"]):
+        _, metrics = train(
+            params["dataset_path"],
+            params["target_column"],
+            algorithm=params["algorithm"],
+            test_size=params["test_size"],
+            random_state=params["random_state"],
+            hyperparameters={**params["hyperparameters"], "n_jobs": params["n_jobs"]},
+            encodings=params.get("encodings"),
+            dtypes=params.get("dtypes"),
+            train_fraction=params["train_fraction"]
+        )
+    return metrics
+
+
+def _make_trial_pool():
+    if settings.TRAINING_EXECUTOR == "inline":
+        return ThreadPoolExecutor(max_workers=settings.SEARCH_POOL_WORKERS)
+    return ProcessPoolExecutor(
+        max_workers=settings.SEARCH_POOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    )
+
+
+def submit_trial(params: dict) -> Future:
+    """Queue a trial on the pool shared by all searches, starting the pool on first use"""
+    global _trial_pool
+    with _trial_pool_lock:
+        if _trial_pool is None:
+            _trial_pool = _make_trial_pool()
+        try:
+            return _trial_pool.submit(run_trial, params)
+        except BrokenProcessPool:
+            # A worker that died breaks the whole pool; later trials get a fresh one
+            _trial_pool = _make_trial_pool()
+            return _trial_pool.submit(run_trial, params)
+
+
+def shutdown_trial_pool():
+    """Stop the trial workers, dropping queued trials"""
+    global _trial_pool
+    with _trial_pool_lock:
+        if _trial_pool is not None:
+            _trial_pool.shutdown(wait=False, cancel_futures=True)
+            _trial_pool = None
+
+
+def generate_candidates(strategy: str, param_grid: Dict[str, List[Any]], n_trials: int, random_state: int) -> List[dict]:
+    """Expand a parameter grid into the candidates a strategy will try"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unsupported search strategy: {strategy}")
+    grid = ParameterGrid(param_grid)
+    if strategy == "grid" or len(grid) <= n_trials:
+        return list(grid)
+    return list(ParameterSampler(param_grid, n_iter=n_trials, random_state=random_state))
+
+
+def rung_fractions(strategy: str, n_candidates: int, halving_factor: int) -> List[float]:
+    """Training-row fractions used by each rung of a search"""
+    if strategy != "halving" or n_candidates <= 1:
+        return [1.0]
+    rungs = max(1, math.ceil(math.log(n_candidates, halving_factor)))
+    return [max(MIN_TRAIN_FRACTION, halving_factor ** (rung - rungs + 1)) for rung in range(rungs)]
+
+
+class HyperparameterSearch:
+    """A running search over candidates of one model"""
+
+    def __init__(
+        self,
+        model_id: int,
+        params: dict,
+        candidates: List[dict],
+        experiment_ids: List[int],
+        strategy: str,
+        scoring: str,
+        max_parallel: int,
+        halving_factor: int = 3
+    ):
+        self.search_id = uuid.uuid4().hex
+        self.model_id = model_id
+        self.params = params
+        self.candidates = candidates
+        self.experiment_ids = experiment_ids
+        self.strategy = strategy
+        self.scoring = scoring
+        self.max_parallel = max_parallel
+        self.halving_factor = max(2, halving_factor)
+        self.status = "queued"
+        self.scores: Dict[int, float] = {}
+        self.best_experiment_id: Optional[int] = None
+        self.cancelled = False
+        self._running: Dict[Future, int] = {}
+        # Candidates of the current rung whose trial completed or failed
+        self._settled = set()
+
+    def state(self) -> dict:
+        """Get the current progress of the search"""
+        return {
+            "search_id": self.search_id,
+            "model_id": self.model_id,
+            "strategy": self.strategy,
+            "scoring": self.scoring,
+            "status": self.status,
+            "experiment_ids": self.experiment_ids,
+            "scores": {self.experiment_ids[i]: score for i, score in self.scores.items()},
+            "best_experiment_id": self.best_experiment_id
+        }
+
+    def start(self):
+        threading.Thread(target=self.run, name=f"search-{self.search_id[:8]}", daemon=True).start()
+
+    def cancel(self):
+        self.cancelled = True
+        # Only this search's queued trials; the pool is shared with other searches
+        for future in list(self._running):
+            future.cancel()
+
+    def run(self):
+        self.status = "running"
+        try:
+            alive = list(range(len(self.candidates)))
+            fractions = rung_fractions(self.strategy, len(alive), self.halving_factor)
+            for rung, fraction in enumerate(fractions):
+                results = self._run_rung(alive, fraction)
+                if self.cancelled:
+                    break
+                ranked = sorted(results, key=lambda i: results[i], reverse=self.scoring not in LOWER_IS_BETTER)
+                if rung < len(fractions) - 1:
+                    keep = ranked[:max(1, math.ceil(len(ranked) / self.halving_factor))]
+                    for i in alive:
+                        if i not in keep and i in results:
+                            _update_experiment(self.experiment_ids[i], status="stopped", completed_at=datetime.utcnow())
+                    alive = keep
+                else:
+                    alive = ranked
+            if self.cancelled:
+                self.status = "cancelled"
+                for i in alive:
+                    # Trials that already finished this rung keep their result
+                    if i not in self._settled:
+                        _update_experiment(self.experiment_ids[i], status="cancelled", completed_at=datetime.utcnow())
+            elif alive:
+                self._promote(alive[0])
+                self.status = "completed"
+            else:
+                self.status = "failed"
+        except Exception as e:
+            print(f"Hyperparameter search {self.search_id} failed: {e}")
+            self.status = "failed"
+        finally:
+            for future in list(self._running):
+                future.cancel()
+            if self.best_experiment_id is None:
+                _reset_model_status(self.model_id)
+
+    def _run_rung(self, alive: List[int], fraction: float) -> Dict[int, float]:
+        queued = list(alive)
+        results = {}
+        self._settled = set()
+        while queued or self._running:
+            # Top up to max_parallel trials in flight as earlier ones finish
+            while queued and len(self._running) < self.max_parallel and not self.cancelled:
+                i = queued.pop(0)
+                _update_experiment(self.experiment_ids[i], status="running")
+                trial = {**self.params, "hyperparameters": {**self.params["hyperparameters"], **self.candidates[i]}, "train_fraction": fraction}
+                self._running[submit_trial(trial)] = i
+            if not self._running:
+                break
+            done, _ = wait(list(self._running), return_when=FIRST_COMPLETED)
+            for future in done:
+                i = self._running.pop(future)
+                if future.cancelled():
+                    continue
+                self._settled.add(i)
+                try:
+                    metrics = future.result()
+                    score = metrics[self.scoring]
+                except Exception as e:
+                    _update_experiment(self.experiment_ids[i], status="failed", description=str(e), completed_at=datetime.utcnow())
+                    continue
+                results[i] = score
+                self.scores[i] = score
+                _update_experiment(
+                    self.experiment_ids[i],
+                    status="completed",
+                    metrics={**metrics, "train_fraction": fraction},
+                    completed_at=datetime.utcnow()
+                )
+        return results
+
+    def _promote(self, best: int):
+        """Retrain the best candidate on all rows and save it as a model version"""
+        experiment_id = self.experiment_ids[best]
+        self.best_experiment_id = experiment_id
+        db = SessionLocal()
+        try:
+            experiment = db.query(ModelExperiment).filter(ModelExperiment.id == experiment_id).first()
+            version = next_model_version(db, experiment)
+        finally:
+            db.close()
+        training_executor.submit(experiment_id, {
+            **self.params,
+            "hyperparameters": {**self.params["hyperparameters"], **self.candidates[best]},
+            "version": version
+        })
+
+
+def _update_experiment(experiment_id: int, **values):
+    db = SessionLocal()
+    try:
+        db.query(ModelExperiment).filter(ModelExperiment.id == experiment_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _reset_model_status(model_id: int):
+    db = SessionLocal()
+    try:
+        model = db.query(MLModel).filter(MLModel.id == model_id).first()
+        if model is not None and model.status == "training":
+            has_versions = db.query(ModelVersion.id).filter(ModelVersion.model_id == model_id).first()
+            model.status = "trained" if has_versions else "draft"
+            db.commit()
+    finally:
+        db.close()
+
+
+_searches: Dict[str, HyperparameterSearch] = {}
+_searches_lock = threading.Lock()
+
+
+def start_search(search: HyperparameterSearch) -> HyperparameterSearch:
+    """Register and start a search"""
+    with _searches_lock:
+        # Forget the oldest finished searches once the history is full
+        finished = [key for key, value in _searches.items() if value.status in ("completed", "failed", "cancelled")]
+        for key in finished[:max(0, len(_searches) - SEARCH_HISTORY + 1)]:
+            del _searches[key]
+        _searches[search.search_id] = search
+    search.start()
+    return search
+
+
+def get_search(search_id: str) -> Optional[HyperparameterSearch]:
+    """Get a search started by this process"""
+    with _searches_lock:
+        return _searches.get(search_id)
@@ -0,0 +1,271 @@
+"""Out-of-core model training
+
+Streaming training never materializes the whole dataset. Record batches
+are read from the memory-mapped columnar parts, converted to pandas
+``TRAINING_STREAM_CHUNK_ROWS`` rows at a time and fed to estimators that
+learn incrementally with ``partial_fit``, so memory is bounded by the chunk
+size rather than the dataset. Rows are assigned to the test split by a hash
+of their position in the dataset: the split is identical on every pass and
+for any chunking, and rows appended by later dataset versions never move
+earlier rows between splits.
+"""
+
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.naive_bayes import GaussianNB
+from sklearn.pipeline import Pipeline
+
+from app.core.config import settings
+from app.services.dataset_storage import iter_columnar_batches, read_columnar_schema
+from app.services.feature_pipeline import StreamingEncoder
+from app.services.training_progress import StageRecorder
+
+STREAMING_ALGORITHMS = {
+    "classification": ("sgd", "naive_bayes"),
+    "regression": ("sgd",),
+    "clustering": ("minibatch_kmeans",)
+}
+# Rows densified at a time for estimators that reject sparse input
+DENSE_BLOCK_ROWS = 4096
+_UINT64_MASK = (1 << 64) - 1
+
+
+def hash_split_mask(start: int, count: int, test_size: float, seed: int) -> np.ndarray:
+    """Flag the rows at positions ``start .. start + count`` that belong to the test split"""
+    offset = np.uint64((seed * 0x9E3779B97F4A7C15) & _UINT64_MASK)
+    x = np.arange(start, start + count, dtype=np.uint64) + offset
+    # splitmix64 finalizer: consecutive positions map to independent uniform values
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+def iter_chunks(dataset_path, columns: List[str], chunk_rows: int) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Yield the position of each chunk's first row and the chunk's selected columns"""
+    position = 0
+    for batch in iter_columnar_batches(dataset_path):
+        table = pa.Table.from_batches([batch]).select(columns)
+        for offset in range(0, table.num_rows, chunk_rows):
+            yield position + offset, table.slice(offset, chunk_rows).to_pandas()
+        position += table.num_rows
+
+
+def _is_numeric(data_type: pa.DataType) -> bool:
+    return (
+        pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+        or pa.types.is_boolean(data_type) or pa.types.is_decimal(data_type)
+    )
+
+
+class BlockDenseGaussianNB(GaussianNB):
+    """GaussianNB accepting the encoder's sparse output, densified a block of rows at a time.
+
+    Saved models are used through ``Pipeline.predict``, so the estimator
+    itself must accept sparse input rather than its callers.
+    """
+
+    def partial_fit(self, X, y, classes=None, sample_weight=None):
+        if not sparse.issparse(X):
+            return super().partial_fit(X, y, classes=classes, sample_weight=sample_weight)
+        for start in range(0, X.shape[0], DENSE_BLOCK_ROWS):
+            block = slice(start, start + DENSE_BLOCK_ROWS)
+            weights = sample_weight[block] if sample_weight is not None else None
+            super().partial_fit(X[block].toarray(), y[block], classes=classes, sample_weight=weights)
+        return self
+
+    def _by_block(self, method, X):
+        if not sparse.issparse(X):
+            return method(X)
+        return np.concatenate([
+            method(X[start:start + DENSE_BLOCK_ROWS].toarray())
+            for start in range(0, X.shape[0], DENSE_BLOCK_ROWS)
+        ])
+
+    def predict(self, X):
+        return self._by_block(super().predict, X)
+
+    def predict_proba(self, X):
+        return self._by_block(super().predict_proba, X)
+
+    def predict_log_proba(self, X):
+        return self._by_block(super().predict_log_proba, X)
+
+
+def build_streaming_estimator(model_type: str, algorithm: str, hyperparameters: dict, random_state: int):
+    """Build an estimator that supports ``partial_fit``"""
+    if algorithm not in STREAMING_ALGORITHMS.get(model_type, ()):
+        raise ValueError(f"Algorithm {algorithm} cannot be trained in streaming mode for {model_type}")
+    if algorithm == "sgd" and model_type == "classification":
+        return SGDClassifier(
+            loss=hyperparameters.get("loss", "log_loss"),
+            alpha=hyperparameters.get("alpha", 1e-4),
+            random_state=random_state
+        )
+    elif algorithm == "sgd":
+        return SGDRegressor(
+            loss=hyperparameters.get("loss", "squared_error"),
+            alpha=hyperparameters.get("alpha", 1e-4),
+            random_state=random_state
+        )
+    elif algorithm == "naive_bayes":
+        return BlockDenseGaussianNB(var_smoothing=hyperparameters.get("var_smoothing", 1e-9))
+    return MiniBatchKMeans(
+        n_clusters=hyperparameters.get("n_clusters", 8),
+        batch_size=hyperparameters.get("batch_size", 1024),
+        n_init=3,
+        random_state=random_state
+    )
+
+
+def _partial_fit(estimator, X, y, **kwargs):
+    if y is None:
+        estimator.partial_fit(X)
+    else:
+        estimator.partial_fit(X, y, **kwargs)
+
+
+class StreamingMetrics:
+    """Evaluation metrics accumulated over test chunks"""
+
+    def __init__(self, model_type: str):
+        self.model_type = model_type
+        self.count = 0
+        self.confusion: Counter = Counter()
+        self.sums = Counter()
+
+    def update(self, estimator, X, y):
+        self.count += X.shape[0]
+        if self.model_type == "clustering":
+            self.sums["inertia"] += -estimator.score(X)
+            return
+        y_pred = estimator.predict(X)
+        if self.model_type == "classification":
+            self.confusion.update(zip(y.tolist(), y_pred.tolist()))
+        else:
+            y = y.astype(np.float64)
+            self.sums["squared_error"] += float(np.sum((y - y_pred) ** 2))
+            self.sums["y"] += float(np.sum(y))
+            self.sums["y_squared"] += float(np.sum(y ** 2))
+
+    def result(self) -> dict:
+        if self.count == 0:
+            return {"test_rows": 0}
+        if self.model_type == "clustering":
+            return {"inertia": float(self.sums["inertia"]), "test_rows": self.count}
+        if self.model_type == "regression":
+            mse = self.sums["squared_error"] / self.count
+            total = self.sums["y_squared"] - self.sums["y"] ** 2 / self.count
+            return {
+                "mse": float(mse),
+                "rmse": float(np.sqrt(mse)),
+                "r2_score": float(1 - self.sums["squared_error"] / total) if total > 0 else 0.0,
+                "test_rows": self.count
+            }
+        # Weighted averages over classes, as sklearn's average="weighted"
+        support, predicted, correct = Counter(), Counter(), Counter()
+        for (true, pred), n in self.confusion.items():
+            support[true] += n
+            predicted[pred] += n
+            if true == pred:
+                correct[true] += n
+        precision = recall = f1 = 0.0
+        for label, n in support.items():
+            p = correct[label] / predicted[label] if predicted[label] else 0.0
+            r = correct[label] / n
+            precision += n * p
+            recall += n * r
+            f1 += n * (2 * p * r / (p + r) if p + r else 0.0)
+        return {
+            "accuracy": float(sum(correct.values()) / self.count),
+            "precision": float(precision / self.count),
+            "recall": float(recall / self.count),
+            "f1_score": float(f1 / self.count),
+            "test_rows": self.count
+        }
+
+
+def train_streaming_model(
+    dataset_path,
+    model_type: str,
+    target_column: str,
+    algorithm: str,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    hyperparameters: dict = None,
+    encodings: dict = None,
+    recorder: Optional[StageRecorder] = None
+):
+    """Train and evaluate a model without loading the dataset into memory.
+
+    Every pass reads the dataset again, so reading and splitting are timed
+    as part of the encode, fit and evaluate stages.
+    """
+    hyperparameters = hyperparameters or {}
+    recorder = recorder or StageRecorder()
+    estimator = build_streaming_estimator(model_type, algorithm, hyperparameters, random_state)
+    unsupported = sorted(col for col, encoding in (encodings or {}).items() if encoding != "hashing")
+    if unsupported:
+        raise ValueError(f"Streaming training hashes categorical columns; cannot honour encodings for {unsupported}")
+
+    schema = read_columnar_schema(dataset_path)
+    supervised = model_type != "clustering"
+    if supervised and schema.get_field_index(target_column) == -1:
+        raise ValueError(f"Unknown target column: {target_column}")
+    features = [field.name for field in schema if field.name != target_column]
+    encoder = StreamingEncoder(
+        numeric=[field.name for field in schema if field.name in features and _is_numeric(field.type)],
+        categorical=[field.name for field in schema if field.name in features and not _is_numeric(field.type)]
+    )
+    columns = features + [target_column] if supervised else features
+    chunk_rows = settings.TRAINING_STREAM_CHUNK_ROWS
+
+    def split_chunks(test: bool) -> Iterator[pd.DataFrame]:
+        for start, frame in iter_chunks(dataset_path, columns, chunk_rows):
+            in_test = hash_split_mask(start, len(frame), test_size, random_state)
+            frame = frame[in_test if test else ~in_test]
+            if supervised:
+                frame = frame[frame[target_column].notna()]
+            if len(frame):
+                yield frame
+
+    # First pass: feature scaling moments and the classes a classifier must know up front
+    classes = set()
+    with recorder.stage("encode", rows=0) as stage:
+        for frame in split_chunks(test=False):
+            encoder.partial_fit(frame[features])
+            stage["rows"] += len(frame)
+            if model_type == "classification":
+                classes.update(frame[target_column].unique().tolist())
+    if not hasattr(encoder, "scaler_"):
+        raise ValueError("Dataset has no training rows")
+    fit_kwargs = {"classes": np.array(sorted(classes, key=str))} if model_type == "classification" else {}
+
+    # Naive Bayes statistics are exact after one pass; gradient methods improve with more
+    epochs = hyperparameters.get("epochs", 1 if algorithm == "naive_bayes" else 5)
+    with recorder.stage("fit", rows=0) as stage:
+        for epoch in range(epochs):
+            for frame in split_chunks(test=False):
+                y = frame[target_column].to_numpy() if supervised else None
+                _partial_fit(estimator, encoder.transform(frame[features]), y, **fit_kwargs)
+                stage["rows"] += len(frame)
+            recorder.progress("fit", epoch + 1, epochs)
+
+    metrics = StreamingMetrics(model_type)
+    with recorder.stage("evaluate") as stage:
+        for frame in split_chunks(test=True):
+            y = frame[target_column].to_numpy() if supervised else None
+            metrics.update(estimator, encoder.transform(frame[features]), y)
+        stage["rows"] = metrics.count
+
+    model = Pipeline([("preprocess", encoder), ("model", estimator)])
+    return model, metrics.result()
@@ -0,0 +1,105 @@
+"""Training progress and per-stage timing
+
+Training code wraps each stage (load, split, encode, fit, evaluate, save)
+in ``StageRecorder.stage``, which measures wall and CPU time, the process's
+peak resident memory and row throughput. The recorder reports progress
+events through a callback. Worker processes forward them over the job's
+pipe to the server process, where ``progress_hub`` fans them out to the
+event streams of the experiment.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.metrics import current_rss_bytes, peak_rss_bytes
+
+# Finished experiments whose events stay available to late subscribers
+EVENT_HISTORY = 100
+# Experiment statuses that end a job; searches mark pruned trials "stopped"
+TERMINAL_EVENTS = ("completed", "failed", "cancelled", "stopped")
+
+
+class StageRecorder:
+    """Times the stages of one training job and reports their progress"""
+
+    def __init__(self, report: Optional[Callable[[dict], None]] = None):
+        self.report = report or (lambda event: None)
+        self.stages: List[dict] = []
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        """Measure a stage; ``rows`` is the number of rows it processes, if known up front"""
+        self.report({"event": "stage_started", "stage": name})
+        started, cpu_started = time.perf_counter(), time.process_time()
+        timing = {"stage": name, "rows": rows}
+        yield timing
+        wall = time.perf_counter() - started
+        timing.update(
+            wall_seconds=round(wall, 3),
+            cpu_seconds=round(time.process_time() - cpu_started, 3),
+            rss_bytes=current_rss_bytes(),
+            # ru_maxrss only grows, so this is the peak up to the end of the stage
+            peak_rss_bytes=peak_rss_bytes(),
+            rows_per_second=round(timing["rows"] / wall, 1) if timing["rows"] and wall > 0 else None
+        )
+        self.stages.append(timing)
+        self.report({"event": "stage_completed", **timing})
+
+    def progress(self, stage: str, done: int, total: int):
+        """Report progress within a long stage"""
+        self.report({"event": "progress", "stage": stage, "done": done, "total": total})
+
+    def summary(self) -> dict:
+        """Totals of the job so far with the timing of every stage"""
+        return {
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+            "cpu_seconds": round(time.process_time() - self._cpu_started, 3),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": list(self.stages)
+        }
+
+
+class ProgressHub:
+    """Fans training events out to the event streams subscribed in this process"""
+
+    def __init__(self, history: int = EVENT_HISTORY):
+        self.history = history
+        self._lock = threading.Lock()
+        self._events: "OrderedDict[int, List[dict]]" = OrderedDict()
+        self._subscribers: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, experiment_id: int, event: dict):
+        """Record an event and deliver it to subscribers; safe to call from any thread"""
+        event = {**event, "time": time.time()}
+        with self._lock:
+            self._events.setdefault(experiment_id, []).append(event)
+            self._events.move_to_end(experiment_id)
+            while len(self._events) > self.history:
+                self._events.popitem(last=False)
+            subscribers = list(self._subscribers.get(experiment_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def subscribe(self, experiment_id: int) -> Tuple[asyncio.Queue, List[dict]]:
+        """Get a queue of future events and the events published so far; call from the event loop"""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(experiment_id, []).append((asyncio.get_running_loop(), queue))
+            return queue, list(self._events.get(experiment_id, ()))
+
+    def unsubscribe(self, experiment_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = [entry for entry in self._subscribers.get(experiment_id, ()) if entry[1] is not queue]
+            if subscribers:
+                self._subscribers[experiment_id] = subscribers
+            else:
+                self._subscribers.pop(experiment_id, None)
+
+
+progress_hub = ProgressHub()
@@ -0,0 +1,272 @@
+"""Background model training executor
+
+Training runs outside the API process: each job gets its own spawned
+worker process, at most ``TRAINING_MAX_WORKERS`` of them at a time, and
+results are persisted by the dispatcher thread that waited on it. Workers
+send stage progress over the same pipe ahead of the result; the dispatcher
+stores each finished stage's timing on the experiment and publishes the
+events to ``progress_hub``. The ``inline`` mode runs jobs in the dispatcher
+thread instead, which keeps tests free of subprocesses.
+"""
+
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from threadpoolctl import threadpool_limits
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.model import MLModel, ModelVersion, ModelExperiment
+from app.services.ml_service import MLService
+from app.services.feature_pipeline import describe_encodings
+from app.services.streaming_training import train_streaming_model
+from app.services.training_progress import StageRecorder, progress_hub
+
+
+def next_model_version(db, experiment: ModelExperiment) -> str:
+    """Get the version an experiment's model will be saved as.
+
+    Each experiment yields at most one version, so its ordinal among the
+    model's experiments is a unique version number.
+    """
+    ordinal = db.query(ModelExperiment).filter(
+        ModelExperiment.model_id == experiment.model_id,
+        ModelExperiment.id <= experiment.id
+    ).count()
+    return f"{ordinal}.0.0"
+
+
+def run_training_job(params: dict, report: Optional[Callable[[dict], None]] = None) -> dict:
+    """Train, evaluate and save a model; runs inside the worker and reports progress events to ``report``"""
+    recorder = StageRecorder(report)
+    service = MLService(settings.MODEL_STORAGE_DIR)
+    hyperparameters = {**params["hyperparameters"], "n_jobs": params["n_jobs"]}
+
+    # Keep BLAS/OpenMP pools inside the job's CPU allotment as well
+    with threadpool_limits(limits=params["n_jobs"]):
+        if params.get("streaming"):
+            model, metrics = train_streaming_model(
+                params["dataset_path"],
+                params["model_type"],
+                params["target_column"],
+                params["algorithm"],
+                test_size=params["test_size"],
+                random_state=params["random_state"],
+                hyperparameters=hyperparameters,
+                encodings=params.get("encodings"),
+                recorder=recorder
+            )
+        else:
+            if params["model_type"] == "classification":
+                train = service.train_classification_model
+            elif params["model_type"] == "regression":
+                train = service.train_regression_model
+            else:
+                raise ValueError(f"Unsupported model type: {params['model_type']}")
+            model, metrics = train(
+                params["dataset_path"],
+                params["target_column"],
+                algorithm=params["algorithm"],
+                test_size=params["test_size"],
+                random_state=params["random_state"],
+                hyperparameters=hyperparameters,
+                encodings=params.get("encodings"),
+                dtypes=params.get("dtypes"),
+                recorder=recorder
+            )
+    with recorder.stage("save"):
+        model_path = service.save_model(model, params["model_id"], params["version"], params.get("save_profile"))
+    return {
+        "model_path": model_path,
+        "metrics": metrics,
+        "encodings": describe_encodings(model),
+        # Peak memory is per job in process mode; inline jobs share the server's peak
+        "resource_usage": {"streaming": bool(params.get("streaming")), **recorder.summary()}
+    }
+
+
+def _process_entry(conn, params: dict):
+    """Worker process entry point, reporting progress and then the outcome over a pipe"""
+    try:
+        conn.send(("completed", run_training_job(params, lambda event: conn.send(("progress", event)))))
+    except BaseException:
+        conn.send(("failed", traceback.format_exc(limit=5)))
+    finally:
+        conn.close()
+
+
+class TrainingJob:
+    """A submitted training job"""
+
+    def __init__(self, experiment_id: int, params: dict):
+        self.experiment_id = experiment_id
+        self.params = params
+        self.future: Optional[Future] = None
+        self.process = None
+        self.cancelled = False
+        self.stages: List[dict] = []
+
+
+class TrainingExecutor:
+    """Bounded pool of training workers with cancellation"""
+
+    def __init__(self, max_workers: int = None, mode: str = None):
+        self.mode = mode or settings.TRAINING_EXECUTOR
+        self._slots = ThreadPoolExecutor(
+            max_workers=max_workers or settings.TRAINING_MAX_WORKERS,
+            thread_name_prefix="training"
+        )
+        self._jobs: Dict[int, TrainingJob] = {}
+        self._lock = threading.Lock()
+        self._mp = multiprocessing.get_context("spawn")
+
+    def submit(self, experiment_id: int, params: dict) -> TrainingJob:
+        """Queue a training job for an experiment"""
+        job = TrainingJob(experiment_id, params)
+        with self._lock:
+            self._jobs[experiment_id] = job
+        progress_hub.publish(experiment_id, {"event": "status", "status": "queued"})
+        job.future = self._slots.submit(self._run, job)
+        return job
+
+    def cancel(self, experiment_id: int) -> bool:
+        """Cancel a queued or running job; returns False if this executor does not own it"""
+        with self._lock:
+            job = self._jobs.get(experiment_id)
+            if job is None:
+                return False
+            job.cancelled = True
+            process = job.process
+        if job.future.cancel():
+            self._finish(job, "cancelled")
+        elif process is not None and process.is_alive():
+            process.terminate()
+        return True
+
+    def active_jobs(self) -> int:
+        """Number of queued or running jobs"""
+        with self._lock:
+            return len(self._jobs)
+
+    def shutdown(self):
+        """Cancel all jobs and stop the dispatcher threads"""
+        for experiment_id in list(self._jobs):
+            self.cancel(experiment_id)
+        self._slots.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: TrainingJob):
+        if job.cancelled:
+            return
+        self._update_experiment(job.experiment_id, status="running")
+        progress_hub.publish(job.experiment_id, {"event": "status", "status": "running"})
+        if self.mode == "inline":
+            try:
+                outcome = ("completed", run_training_job(job.params, lambda event: self._on_progress(job, event)))
+            except Exception:
+                outcome = ("failed", traceback.format_exc(limit=5))
+        else:
+            outcome = self._run_in_process(job)
+        if job.cancelled:
+            outcome = ("cancelled", None)
+        self._finish(job, *outcome)
+
+    def _run_in_process(self, job: TrainingJob):
+        receiver, sender = self._mp.Pipe(duplex=False)
+        process = self._mp.Process(target=_process_entry, args=(sender, job.params), daemon=True)
+        with self._lock:
+            if job.cancelled:
+                return ("cancelled", None)
+            job.process = process
+            process.start()
+        sender.close()
+        try:
+            while True:
+                outcome = receiver.recv()
+                if outcome[0] != "progress":
+                    break
+                self._on_progress(job, outcome[1])
+        except EOFError:
+            # The worker exited without reporting: terminated or crashed
+            outcome = ("failed", f"Training process exited with code {process.exitcode}")
+        finally:
+            receiver.close()
+            process.join()
+        return outcome
+
+    def _on_progress(self, job: TrainingJob, event: dict):
+        """Publish a progress event, storing finished stages so other servers can show them"""
+        if event["event"] == "stage_completed":
+            job.stages.append({key: value for key, value in event.items() if key != "event"})
+            # Stored before publishing: a stream's snapshot then holds every stage published before it was read
+            try:
+                self._update_experiment(job.experiment_id, resource_usage={"stages": job.stages})
+            except Exception as e:
+                print(f"Error saving training progress for experiment {job.experiment_id}: {e}")
+        progress_hub.publish(job.experiment_id, event)
+
+    def _update_experiment(self, experiment_id: int, **values):
+        db = SessionLocal()
+        try:
+            db.query(ModelExperiment).filter(ModelExperiment.id == experiment_id).update(values)
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish(self, job: TrainingJob, status: str, result=None):
+        """Persist the outcome of a job"""
+        with self._lock:
+            self._jobs.pop(job.experiment_id, None)
+        db = SessionLocal()
+        try:
+            experiment = db.query(ModelExperiment).filter(ModelExperiment.id == job.experiment_id).first()
+            if experiment is None:
+                return
+            model = db.query(MLModel).filter(MLModel.id == experiment.model_id).first()
+            experiment.status = status
+            experiment.completed_at = datetime.utcnow()
+            if status == "completed":
+                experiment.metrics = result["metrics"]
+                experiment.resource_usage = result["resource_usage"]
+                db.add(ModelVersion(
+                    version=job.params["version"],
+                    model_path=result["model_path"],
+                    metrics=result["metrics"],
+                    hyperparameters=job.params["hyperparameters"],
+                    training_config={
+                        **{
+                            key: job.params[key]
+                            for key in (
+                                "dataset_id", "dataset_version", "target_column",
+                                "test_size", "random_state", "n_jobs", "save_profile", "streaming"
+                            )
+                        },
+                        "encodings": result["encodings"]
+                    },
+                    model_id=experiment.model_id
+                ))
+                if model is not None:
+                    model.status = "trained"
+            else:
+                if result:
+                    experiment.description = result
+                if model is not None:
+                    has_versions = db.query(ModelVersion.id).filter(ModelVersion.model_id == model.id).first()
+                    model.status = "trained" if has_versions else "draft"
+            db.commit()
+        except Exception as e:
+            print(f"Error saving training result for experiment {job.experiment_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        if status == "completed":
+            event = {"metrics": result["metrics"], "resource_usage": result["resource_usage"]}
+        else:
+            event = {"error": result} if result else {}
+        progress_hub.publish(job.experiment_id, {"event": status, **event})
+
+
+training_executor = TrainingExecutor()
@@ -0,0 +1,306 @@
+"""Streaming upload helpers
+
+Uploaded files are stored once per content under their sha256 digest.
+Datasets reference these blobs by path, so identical uploads share one
+file and a blob is deleted with the last dataset that references it.
+"""
+
+import asyncio
+import hashlib
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import aiofiles
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_engine
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds its size limit"""
+
+
+class UploadMissingFileError(Exception):
+    """Raised when a multipart upload has no part for the file field"""
+
+
+class UploadSessionLimitError(Exception):
+    """Raised when a user already has the maximum number of open upload sessions"""
+
+
+class UploadSessionNotFoundError(Exception):
+    """Raised when a resumable upload session does not exist"""
+
+
+class UploadOffsetMismatchError(Exception):
+    """Raised when a resumable chunk does not start at the current offset"""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Chunk must start at offset {expected}")
+        self.expected = expected
+
+
+UPLOAD_TMP_DIR = Path(settings.UPLOAD_TMP_DIR)
+UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_DIR = Path(settings.BLOB_DIR)
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
+
+# Room for the boundaries and part headers around the file in a multipart body
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Serialize storing and releasing the same blob within this worker
+_BLOB_LOCKS = [asyncio.Lock() for _ in range(64)]
+# Serialize the requests of one resumable upload session within this worker
+_SESSION_LOCKS = [asyncio.Lock() for _ in range(64)]
+
+
+class _MultipartFileReader:
+    """Parses a multipart body as it arrives, keeping the data of one file field"""
+
+    def __init__(self, boundary: bytes, field: str):
+        self.field = field.encode()
+        self.found = False
+        self.filename: Optional[str] = None
+        self._in_file = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._data: List[bytes] = []
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._in_file = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first part named like the field is the file
+        self._in_file = not self.found and options.get(b"name") == self.field
+        if self._in_file:
+            self.found = True
+            filename = options.get(b"filename")
+            self.filename = filename.decode("utf-8", "replace") if filename is not None else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._data.append(data[start:end])
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Parse the next chunk of the body and return the file bytes it held"""
+        self._parser.write(chunk)
+        data = b"".join(self._data)
+        self._data.clear()
+        return data
+
+    def finalize(self):
+        self._parser.finalize()
+
+
+async def stream_request_to_file(
+    request: Request,
+    dest_path: Path,
+    max_size: int,
+    field: str = "file",
+    append: bool = False,
+    start_size: int = 0
+) -> Tuple[int, Optional[str], Optional[str]]:
+    """Write an upload to disk straight from the request body as it arrives.
+
+    A ``multipart/form-data`` body is parsed incrementally and only the part
+    named ``field`` is written; any other body is written as-is. Requests
+    whose ``Content-Length`` is over the size limit are rejected before
+    reading, the limit is enforced again as bytes arrive and the sha256
+    digest is computed in the same pass. Returns ``(bytes_written, digest,
+    filename)``; the digest is ``None`` in append mode since it only covers
+    part of the file.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    reader = None
+    if content_type == b"multipart/form-data":
+        if b"boundary" not in options:
+            raise UploadMissingFileError("Multipart body has no boundary")
+        reader = _MultipartFileReader(options[b"boundary"], field)
+    
+    content_length = request.headers.get("content-length", "")
+    overhead = MULTIPART_OVERHEAD if reader is not None else 0
+    if content_length.isdigit() and start_size + int(content_length) > max_size + overhead:
+        raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+    
+    digest = None if append else hashlib.sha256()
+    written = 0
+    try:
+        async with aiofiles.open(dest_path, "ab" if append else "wb") as f:
+            async for chunk in request.stream():
+                data = reader.feed(chunk) if reader is not None else chunk
+                if not data:
+                    continue
+                written += len(data)
+                if start_size + written > max_size:
+                    raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+                if digest is not None:
+                    digest.update(data)
+                await f.write(data)
+        if reader is not None:
+            reader.finalize()
+            if not reader.found:
+                raise UploadMissingFileError(f"Multipart body has no {field} field")
+    except Exception:
+        if append:
+            # Drop the partial chunk so the session can resume from its last good offset
+            with open(dest_path, "r+b") as f:
+                f.truncate(start_size)
+        else:
+            dest_path.unlink(missing_ok=True)
+        raise
+    filename = reader.filename if reader is not None else None
+    return written, digest.hexdigest() if digest is not None else None, filename
+
+
+def hash_file(file_path: Path) -> str:
+    """Compute the sha256 digest of a file in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_lock(key: str) -> asyncio.Lock:
+    """Get the lock guarding a blob, keyed by content hash or file path"""
+    return _BLOB_LOCKS[hash(key) % len(_BLOB_LOCKS)]
+
+
+@asynccontextmanager
+async def blob_guard(db: AsyncSession, key: str):
+    """Lock a blob across workers until the session's transaction ends.
+
+    On PostgreSQL a transaction-scoped advisory lock keyed by ``key`` is
+    taken, so the caller must commit or roll back inside the block; other
+    databases only get the lock of this worker.
+    """
+    async with blob_lock(key):
+        if async_engine.dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": key})
+        yield
+
+
+def session_lock(upload_id: str) -> asyncio.Lock:
+    """Get the lock serializing the chunk, complete and cancel requests of an upload session"""
+    return _SESSION_LOCKS[hash(upload_id) % len(_SESSION_LOCKS)]
+
+
+def get_blob_path(content_hash: str, suffix: str) -> Path:
+    """Get the content-addressed path of an uploaded file"""
+    return BLOB_DIR / content_hash[:2] / f"{content_hash}{suffix.lower()}"
+
+
+def new_upload_path() -> Path:
+    """Get a unique temporary path for a single-request upload"""
+    return UPLOAD_TMP_DIR / f"{uuid.uuid4().hex}.upload"
+
+
+def store_blob(file_path: Path, content_hash: str, suffix: str) -> Path:
+    """Move an uploaded file to its blob, dropping it instead if the blob already exists"""
+    blob_path = get_blob_path(content_hash, suffix)
+    if blob_path.exists():
+        file_path.unlink()
+    else:
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.replace(blob_path)
+    return blob_path
+
+
+def get_session_path(user_id: int, upload_id: str) -> Path:
+    """Get the partial file backing a resumable upload session"""
+    # upload_id is a uuid hex string; reject anything else to keep paths inside UPLOAD_TMP_DIR
+    try:
+        upload_id = uuid.UUID(hex=upload_id).hex
+    except ValueError:
+        raise UploadSessionNotFoundError(upload_id)
+    return UPLOAD_TMP_DIR / f"{user_id}_{upload_id}.part"
+
+
+def expire_upload_sessions() -> int:
+    """Remove upload sessions and temporary uploads idle for longer than the session TTL"""
+    # Every chunk written updates the mtime, so only abandoned files are this old
+    cutoff = time.time() - settings.UPLOAD_SESSION_TTL_SECONDS
+    removed = 0
+    for path in UPLOAD_TMP_DIR.iterdir():
+        if path.suffix not in (".part", ".upload"):
+            continue
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Completed or cancelled meanwhile
+            continue
+    if removed:
+        print(f"Removed {removed} expired uploads")
+    return removed
+
+
+def create_upload_session(user_id: int) -> str:
+    """Create an empty resumable upload session and return its id"""
+    expire_upload_sessions()
+    open_sessions = sum(1 for _ in UPLOAD_TMP_DIR.glob(f"{user_id}_*.part"))
+    if open_sessions >= settings.MAX_UPLOAD_SESSIONS_PER_USER:
+        raise UploadSessionLimitError(f"At most {settings.MAX_UPLOAD_SESSIONS_PER_USER} open uploads per user")
+    upload_id = uuid.uuid4().hex
+    get_session_path(user_id, upload_id).touch()
+    return upload_id
+
+
+def get_session_offset(user_id: int, upload_id: str) -> int:
+    """Get the number of bytes received so far for an upload session"""
+    session_path = get_session_path(user_id, upload_id)
+    if not session_path.exists():
+        raise UploadSessionNotFoundError(upload_id)
+    return session_path.stat().st_size
+
+
+async def append_upload_chunk(user_id: int, upload_id: str, offset: int, request: Request) -> int:
+    """Append the chunk in a request's body to an upload session and return the new offset"""
+    # Without the lock two requests for the same offset could both pass the check and both append
+    async with session_lock(upload_id):
+        current = get_session_offset(user_id, upload_id)
+        if offset != current:
+            raise UploadOffsetMismatchError(current)
+        written, _, _ = await stream_request_to_file(
+            request,
+            get_session_path(user_id, upload_id),
+            settings.MAX_RESUMABLE_UPLOAD_SIZE,
+            field="chunk",
+            append=True,
+            start_size=current
+        )
+    return current + written
+
+
+def discard_upload_session(user_id: int, upload_id: str):
+    """Remove the partial file of an upload session"""
+    get_session_path(user_id, upload_id).unlink(missing_ok=True)
@@ -11,6 +11,8 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.database import init_db
+from app.core.pagination import PAGINATION_HEADERS
+from app.core.responses import ORJSONResponse
 from app.api.v1 import api_router
 
 
@@ -24,18 +26,36 @@ async def lifespan(app: FastAPI):
     print(f"CORS Origins: {settings.CORS_ORIGINS}")
     print("=" * 50)
     await init_db()
+    from app.services.upload_service import expire_upload_sessions
+    expire_upload_sessions()
+    if settings.MODEL_CACHE_WARMUP:
+        from app.services.model_cache import warm_model_cache
+        try:
+            warm_model_cache()
+        except Exception as e:
+            print(f"Error warming model cache: {e}")
     print("Backend ready! API available at http://0.0.0.0:8000")
     print("API docs available at http://0.0.0.0:8000/docs")
     yield
     # Shutdown
-    pass
+    from app.services.training_service import training_executor
+    training_executor.shutdown()
+    from app.services.search_service import shutdown_trial_pool
+    shutdown_trial_pool()
+    from app.core.executor import compute_executor
+    compute_executor.shutdown()
+    from app.core.cache import result_cache
+    await result_cache.close()
+    from app.core.database import async_engine
+    await async_engine.dispose()
 
 
 app = FastAPI(
     title="ML-AI Studio API",
     description="Comprehensive Machine Learning and AI Studio Platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -55,6 +75,7 @@ app.add_middleware(
     allow_credentials=allow_creds,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGINATION_HEADERS,
 )
 
 # Include API routes
@@ -74,13 +95,15 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    from app.core.database import engine
+    from app.core.cache import result_cache
+    from app.core.database import async_engine, pool_metrics
+    from app.core.executor import compute_executor
     from sqlalchemy import text
     
     db_status = "unknown"
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
             db_status = "connected"
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -88,7 +111,10 @@ async def health_check():
     return JSONResponse({
         "status": "healthy" if db_status == "connected" else "degraded",
         "service": "ml-ai-studio-backend",
-        "database": db_status
+        "database": db_status,
+        "database_pool": pool_metrics(),
+        "compute_executor": compute_executor.stats(),
+        "result_cache": result_cache.stats()
     })
 
 
@@ -0,0 +1,42 @@
+"""Tests for the keyset pagination cursors"""
+
+import base64
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("created_at, row_id", [
+    (datetime(2024, 2, 29, 23, 59, 59, 123456), 42),
+    (datetime(2023, 1, 1), 1),
+    (datetime(2023, 6, 1, 12, 30, tzinfo=timezone(timedelta(hours=-5))), 2**40)
+])
+def test_cursor_round_trip(created_at, row_id):
+    cursor = encode_cursor(created_at, row_id)
+    # Safe in a query string without escaping
+    assert re.fullmatch(r"[A-Za-z0-9_-]+", cursor)
+    assert decode_cursor(cursor) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor",
+    raw_cursor(None),
+    raw_cursor("x"),
+    raw_cursor([1]),
+    raw_cursor([1, 2]),
+    raw_cursor(["yesterday", 1]),
+    raw_cursor(["2024-01-01T00:00:00", "x"]),
+    base64.urlsafe_b64encode(b"\xff\xfe[").decode()
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,159 @@
+"""Tests for the mergeable statistics of the streaming profiler"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.services.profiler import (
+    KLL_K,
+    PROFILE_QUANTILES,
+    ColumnProfile,
+    DatasetProfiler,
+    HyperLogLog,
+    KLLSketch
+)
+
+# Normalized rank error allowed for KLL quantiles; k=128 is typically within 2%
+KLL_RANK_TOLERANCE = 0.03
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def hll_of(values: np.ndarray) -> HyperLogLog:
+    sketch = HyperLogLog()
+    sketch.add_hashes(pd.util.hash_array(values))
+    return sketch
+
+
+def kll_weight(sketch: KLLSketch) -> int:
+    """Number of values a sketch stands for; compaction must keep it exact"""
+    return sum(len(items) << level for level, items in enumerate(sketch.levels))
+
+
+def rank_error(data: np.ndarray, value: float, q: float) -> float:
+    """Distance between the rank range of an estimated quantile and the requested rank"""
+    ordered = np.sort(data)
+    low = np.searchsorted(ordered, value, side="left") / len(data)
+    high = np.searchsorted(ordered, value, side="right") / len(data)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+def numeric_profile(chunks) -> ColumnProfile:
+    profile = ColumnProfile(pa.float64())
+    for chunk in chunks:
+        profile.update(pa.array(chunk))
+    return profile
+
+
+@pytest.mark.parametrize("n", [10, 1000, 100_000])
+def test_hll_estimates_distinct_count(n):
+    values = np.repeat(np.arange(n), 3)
+    # The standard error is 1.04 / sqrt(2048), about 2.3%
+    assert abs(hll_of(values).estimate() - n) <= max(1, 0.1 * n)
+
+
+def test_hll_merge_equals_sketch_of_union():
+    left, right = np.arange(0, 60_000), np.arange(40_000, 100_000)
+    merged = hll_of(left)
+    merged.merge(hll_of(right))
+    np.testing.assert_array_equal(merged.registers, hll_of(np.concatenate([left, right])).registers)
+    assert abs(merged.estimate() - 100_000) <= 10_000
+
+
+def test_hll_state_round_trip():
+    sketch = hll_of(np.arange(5000))
+    restored = HyperLogLog.from_dict(sketch.to_dict())
+    assert restored.precision == sketch.precision
+    np.testing.assert_array_equal(restored.registers, sketch.registers)
+
+
+def test_kll_quantiles_within_rank_error(rng):
+    data = rng.lognormal(size=200_000)
+    sketch = KLLSketch()
+    for chunk in np.array_split(data, 50):
+        sketch.update(chunk)
+    assert kll_weight(sketch) == len(data)
+    # A bounded sample rather than the data
+    assert sum(len(items) for items in sketch.levels) < 20 * KLL_K
+    estimates = sketch.quantiles(PROFILE_QUANTILES)
+    for q in PROFILE_QUANTILES:
+        assert rank_error(data, estimates[str(q)], q) < KLL_RANK_TOLERANCE
+
+
+def test_kll_merge_matches_whole(rng):
+    data = rng.normal(size=100_000)
+    left, right = KLLSketch(), KLLSketch()
+    left.update(data[:30_000])
+    right.update(data[30_000:])
+    left.merge(KLLSketch.from_dict(right.to_dict()))
+    assert kll_weight(left) == len(data)
+    estimates = left.quantiles(PROFILE_QUANTILES)
+    for q in PROFILE_QUANTILES:
+        assert rank_error(data, estimates[str(q)], q) < KLL_RANK_TOLERANCE
+
+
+def test_kll_small_and_empty():
+    assert KLLSketch().quantiles([0.5]) == {"0.5": None}
+    sketch = KLLSketch()
+    sketch.update(np.array([3.0, 1.0, 2.0]))
+    assert sketch.quantiles([0.0, 0.5, 1.0]) == {"0.0": 1.0, "0.5": 2.0, "1.0": 3.0}
+
+
+def test_moment_merge_matches_numpy(rng):
+    # A large offset makes a naive sum of squares lose most of its digits
+    data = rng.normal(loc=1e6, scale=3.0, size=50_000)
+    chunks = np.array_split(data, [1, 17, 5000, 20_000])
+    profile = numeric_profile(chunks[:3])
+    profile.merge(numeric_profile(chunks[3:]))
+    stats = profile.summary()
+    assert stats["count"] == len(data)
+    assert stats["mean"] == pytest.approx(np.mean(data), rel=1e-12)
+    assert stats["variance"] == pytest.approx(np.var(data, ddof=1), rel=1e-8)
+    assert stats["std"] == pytest.approx(np.std(data, ddof=1), rel=1e-8)
+    assert (stats["min"], stats["max"]) == (data.min(), data.max())
+
+
+def test_moments_skip_nulls_and_non_finite_values():
+    profile = numeric_profile([[1.0, None, np.nan, 3.0, np.inf]])
+    stats = profile.summary()
+    assert (stats["count"], stats["null_count"]) == (2, 1)
+    assert stats["mean"] == 2.0
+    assert stats["variance"] == 2.0
+
+
+def test_merging_into_empty_profile():
+    profile = ColumnProfile(pa.float64())
+    profile.merge(numeric_profile([[2.0, 4.0]]))
+    assert (profile.count, profile.mean, profile.m2) == (2, 3.0, 2.0)
+
+
+def test_profile_extended_from_state_matches_single_pass(rng):
+    frame = pd.DataFrame({
+        "x": rng.normal(size=10_000),
+        "label": rng.choice(["a", "b", "c"], size=10_000)
+    })
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    head, tail = table.slice(0, 6000), table.slice(6000)
+    
+    stored = DatasetProfiler(table.schema)
+    for batch in head.to_batches():
+        stored.update(batch)
+    extended = DatasetProfiler.from_state(table.schema, stored.to_state())
+    added = DatasetProfiler(table.schema)
+    for batch in tail.to_batches():
+        added.update(batch)
+    extended.merge(added)
+    
+    whole = DatasetProfiler(table.schema)
+    for batch in table.to_batches():
+        whole.update(batch)
+    assert extended.row_count == whole.row_count == len(frame)
+    for name in frame.columns:
+        np.testing.assert_array_equal(extended.columns[name].distinct.registers, whole.columns[name].distinct.registers)
+    x = extended.columns["x"].summary()
+    assert x["mean"] == pytest.approx(frame["x"].mean(), rel=1e-12)
+    assert x["std"] == pytest.approx(frame["x"].std(), rel=1e-9)
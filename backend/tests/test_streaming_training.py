@@ -0,0 +1,96 @@
+"""Tests for the hash train/test split and metrics of streaming training"""
+
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, precision_score, r2_score, recall_score
+
+from app.services.streaming_training import StreamingMetrics, hash_split_mask
+
+UINT64_MASK = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def splitmix64(value: int) -> int:
+    """Reference splitmix64 finalizer on Python integers"""
+    z = value & UINT64_MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & UINT64_MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & UINT64_MASK
+    return z ^ (z >> 31)
+
+
+def reference_mask(start: int, count: int, test_size: float, seed: int) -> np.ndarray:
+    offset = seed * GOLDEN_GAMMA
+    return np.array([(splitmix64(p + offset) >> 11) / float(1 << 53) < test_size for p in range(start, start + count)])
+
+
+class FixedPredictions:
+    """Stands in for an estimator; X holds the positions of the rows to predict"""
+
+    def __init__(self, predictions: np.ndarray):
+        self.predictions = predictions
+
+    def predict(self, X):
+        return self.predictions[X]
+
+
+def test_hash_split_known_value():
+    # First output of a splitmix64 generator seeded with 0
+    value = (0xE220A8397B1DCDAF >> 11) / float(1 << 53)
+    assert hash_split_mask(0, 1, value + 1e-9, seed=1)[0]
+    assert not hash_split_mask(0, 1, value, seed=1)[0]
+
+
+@pytest.mark.parametrize("start, seed", [(0, 0), (123, 42), ((1 << 40) + 7, 2**63 + 5)])
+def test_hash_split_matches_reference(start, seed):
+    np.testing.assert_array_equal(
+        hash_split_mask(start, 2000, 0.3, seed),
+        reference_mask(start, 2000, 0.3, seed)
+    )
+
+
+def test_hash_split_independent_of_chunking():
+    whole = hash_split_mask(0, 10_000, 0.2, seed=7)
+    bounds = [0, 1, 999, 4096, 10_000]
+    chunks = [hash_split_mask(low, high - low, 0.2, seed=7) for low, high in zip(bounds, bounds[1:])]
+    np.testing.assert_array_equal(np.concatenate(chunks), whole)
+
+
+def test_hash_split_fraction_and_seed():
+    mask = hash_split_mask(0, 200_000, 0.2, seed=42)
+    assert mask.mean() == pytest.approx(0.2, abs=0.005)
+    assert not np.array_equal(mask, hash_split_mask(0, 200_000, 0.2, seed=43))
+    assert not hash_split_mask(0, 1000, 0.0, seed=42).any()
+    assert hash_split_mask(0, 1000, 1.0, seed=42).all()
+
+
+def feed(metrics: StreamingMetrics, predictions: np.ndarray, y: np.ndarray):
+    estimator = FixedPredictions(predictions)
+    for positions in np.array_split(np.arange(len(y)), [3, 250, 600]):
+        metrics.update(estimator, positions, y[positions])
+
+
+def test_streaming_classification_metrics_match_sklearn():
+    rng = np.random.default_rng(0)
+    y = rng.choice(["a", "b", "c"], size=1000, p=[0.6, 0.3, 0.1])
+    # Mostly right, and a label the test rows never have
+    predictions = np.where(rng.random(1000) < 0.8, y, rng.choice(["a", "b", "d"], size=1000))
+    metrics = StreamingMetrics("classification")
+    feed(metrics, predictions, y)
+    result = metrics.result()
+    assert result["test_rows"] == len(y)
+    assert result["accuracy"] == pytest.approx(accuracy_score(y, predictions))
+    for name, score in (("precision", precision_score), ("recall", recall_score), ("f1_score", f1_score)):
+        assert result[name] == pytest.approx(score(y, predictions, average="weighted", zero_division=0))
+
+
+def test_streaming_regression_metrics_match_sklearn():
+    rng = np.random.default_rng(1)
+    y = rng.normal(loc=50, scale=10, size=1000)
+    predictions = y + rng.normal(scale=3, size=1000)
+    metrics = StreamingMetrics("regression")
+    feed(metrics, predictions, y)
+    result = metrics.result()
+    mse = mean_squared_error(y, predictions)
+    assert result["mse"] == pytest.approx(mse)
+    assert result["rmse"] == pytest.approx(np.sqrt(mse))
+    assert result["r2_score"] == pytest.approx(r2_score(y, predictions), rel=1e-9)
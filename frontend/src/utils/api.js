@@ -43,6 +43,11 @@ api.interceptors.response.use(
       })
     }
     
+    // A rejected token is dropped so later requests fall back to the default user
+    if (error.response?.status === 401) {
+      localStorage.removeItem('token')
+    }
+    
     // Authentication disabled - no redirect on 401
     // if (error.response?.status === 401) {
     //   localStorage.removeItem('token')